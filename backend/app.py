@@ -1,20 +1,118 @@
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, jsonify, request, send_from_directory, send_file
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, Future
+from urllib.parse import urlsplit
+from werkzeug.exceptions import HTTPException
 import sqlite3
+import re
 import os
+import time
+import queue
+import threading
+import io
 import json
 import math
+import gzip
+import zlib
 import random
+import base64
 import hashlib
 import smtplib
+import sys
+import calendar
+import struct
+import cProfile
+import pstats
+import marshal
+import hmac
+import functools
+import itertools
+from collections import deque, OrderedDict
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
+try:
+    from PIL import Image  # Optional — thumbnails fall back to the original image without it
+except ImportError:
+    Image = None
+
+try:
+    import orjson  # Optional — much faster JSON encoding, stdlib json is used without it
+except ImportError:
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Compact JSON encoding, using orjson when it's installed (set JSON_ENCODER=stdlib to opt out)."""
+    compact = True
+    sort_keys = False
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.use_orjson = orjson is not None and os.environ.get('JSON_ENCODER', 'orjson') != 'stdlib'
+
+    def dumps(self, obj, **kwargs):
+        if self.use_orjson:
+            return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+        kwargs.setdefault('separators', (',', ':'))
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.use_orjson:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+
 app = Flask(__name__, static_folder='../frontend/build', static_url_path='/')
-CORS(app)
+app.json = FastJSONProvider(app)
+CORS(app, expose_headers=['X-Sync-Token', 'X-Profile-Id', 'Idempotent-Replayed'])
 
 DB_PATH = os.path.join(os.path.dirname(__file__), 'volunteer_hub.db')
+BLOB_DIR = os.environ.get('BLOB_DIR', os.path.join(os.path.dirname(__file__), 'blobs'))
+BLOB_MAX_BYTES = 5 * 1024 * 1024  # Matches the 5MB limit enforced by the upload UI
+THUMBNAIL_SIZE = (320, 320)
+# The blob store only holds photos; these are the formats it accepts and serves inline
+BLOB_IMAGE_SIGNATURES = [(b'\xff\xd8\xff', 'image/jpeg'), (b'\x89PNG\r\n\x1a\n', 'image/png'),
+                         (b'GIF87a', 'image/gif'), (b'GIF89a', 'image/gif')]
+BLOB_IMAGE_TYPES = {'image/jpeg', 'image/png', 'image/gif', 'image/webp'}
+
+TASK_ARCHIVE_AFTER_DAYS = 90     # Completed tasks move to tasks_archive after this long
+POST_ARCHIVE_AFTER_DAYS = 365    # Community posts move to community_posts_archive after this long
+MAINTENANCE_INTERVAL_SECONDS = int(os.environ.get('MAINTENANCE_INTERVAL_SECONDS', 24 * 3600))
+
+WRITE_BATCH_MAX = 64       # Most write operations grouped into one transaction
+WRITE_BATCH_WAIT_MS = 2    # How long the writer waits for more work before committing a batch
+WRITE_TIMEOUT_SECONDS = 30
+
+BATCH_MAX_REQUESTS = 20
+BATCH_WORKERS = 4
+BATCH_FORWARDED_HEADERS = ('X-Sync-Token',)  # Sub-response headers passed back inside /api/batch
+
+COMPRESS_MIN_BYTES = 1024  # Responses smaller than this aren't worth compressing
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/html', 'text/plain', 'text/css',
+                          'application/javascript', 'text/javascript'}
+
+# Task columns for list views — never includes the completion photo payload
+TASK_COLUMNS = ['id', 'title', 'description', 'posted_by', 'assigned_to', 'status',
+                'duration_minutes', 'location_address', 'city', 'latitude', 'longitude',
+                'is_verified', 'scheduled_date', 'scheduled_time', 'completion_photo_id',
+                'completion_notes', 'created_at', 'completed_at', 'duplicate_of', 'updated_at']
+TASK_LIST_COLUMNS = ', '.join(f"t.{c}" for c in TASK_COLUMNS)
+
+# User columns that are safe to send to clients — password_hash never leaves the server
+USER_COLUMNS = ['id', 'name', 'username', 'email', 'avatar_initials', 'is_verified',
+                'is_organization', 'member_since', 'rating', 'total_hours', 'tasks_completed',
+                'created_at']
+USER_PUBLIC_COLUMNS = ', '.join(USER_COLUMNS)
+
+POST_COLUMNS = ['id', 'user_id', 'task_id', 'content', 'image_url', 'image_blob_id', 'created_at', 'likes',
+                'updated_at']
+AVAILABILITY_COLUMNS = ['id', 'user_id', 'date', 'start_time', 'end_time', 'city', 'start_ts', 'end_ts',
+                        'updated_at']
+# Availability embedded in volunteer cards — without the interval and sync bookkeeping columns
+AVAILABILITY_CARD_COLUMNS = ', '.join(c for c in AVAILABILITY_COLUMNS if c not in ('start_ts', 'end_ts', 'updated_at'))
 
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
@@ -62,14 +160,744 @@ Thank you for joining us!
         print(f"[EMAIL-ERROR] Failed to send to {to_email}: {e}")
         return False
 
+# Set by /api/batch so every sub-request in a batch reads through one shared connection
+_shared_db = threading.local()
+
 def get_db():
+    shared = getattr(_shared_db, 'conn', None)
+    if shared is not None:
+        return shared
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA busy_timeout = 5000")
+    queries = getattr(_profile_state, 'queries', None)
+    if queries is not None:
+        return ProfiledConnection(conn, queries)
     return conn
 
+
+# ============ WRITE QUEUE ============
+class DBWriter:
+    """Single writer thread that applies queued write operations in grouped transactions.
+
+    Each operation is a function taking the writer's connection. Operations that arrive together
+    share one BEGIN IMMEDIATE ... COMMIT (one fsync), each inside its own savepoint so a failing
+    operation only rolls back its own changes. Callers get a Future that resolves after commit.
+    Operations submitted with foreign_keys=False get their own transaction with enforcement off
+    (the pragma can't change inside a transaction). Operations submitted with exclusive=True
+    (VACUUM, ANALYZE) run between batches with no transaction at all, pausing writes rather
+    than failing them on the lock.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.stats = {'batches': 0, 'operations': 0, 'failed_operations': 0, 'exclusive_operations': 0,
+                      'busy_retries': 0, 'max_batch_size': 0, 'last_batch_size': 0, 'commit_ms_total': 0.0}
+        self.thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, fn, foreign_keys=True, exclusive=False):
+        future = Future()
+        self.queue.put((fn, future, (foreign_keys, exclusive)))
+        return future
+
+    def metrics(self):
+        with self.lock:
+            stats = dict(self.stats)
+        batches = stats['batches'] or 1
+        stats['queue_depth'] = self.queue.qsize()
+        stats['avg_batch_size'] = round(stats['operations'] / batches, 2)
+        stats['avg_commit_ms'] = round(stats.pop('commit_ms_total') / batches, 3)
+        return stats
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA busy_timeout = 5000")
+        return conn
+
+    def _next_batch(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + WRITE_BATCH_WAIT_MS / 1000.0
+        while len(batch) < WRITE_BATCH_MAX:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        conn = self._connect()
+        while True:
+            for (foreign_keys, exclusive), group in itertools.groupby(self._next_batch(), key=lambda op: op[2]):
+                ops = [(fn, future) for fn, future, _ in group]
+                if exclusive:
+                    for fn, future in ops:
+                        self._run_exclusive(conn, fn, future)
+                else:
+                    self._commit_batch(conn, ops, foreign_keys)
+
+    def _run_exclusive(self, conn, fn, future):
+        try:
+            result = fn(conn)
+        except Exception as e:
+            print(f"[DB-WRITER] Exclusive operation {fn.__qualname__} failed: {e}")
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        with self.lock:
+            self.stats['exclusive_operations'] += 1
+
+    def _begin(self, conn):
+        """BEGIN IMMEDIATE, retried while another connection (e.g. another worker process) holds
+        the lock for longer than busy_timeout, up to WRITE_TIMEOUT_SECONDS."""
+        deadline = time.monotonic() + WRITE_TIMEOUT_SECONDS
+        while True:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as e:
+                if 'database is locked' not in str(e) or time.monotonic() >= deadline:
+                    raise
+                with self.lock:
+                    self.stats['busy_retries'] += 1
+                print("[DB-WRITER] Database busy, retrying BEGIN IMMEDIATE")
+
+    def _commit_batch(self, conn, batch, foreign_keys):
+        results = []
+        failed = 0
+        started = time.monotonic()
+        if not foreign_keys:
+            conn.execute("PRAGMA foreign_keys = OFF")
+        try:
+            self._begin(conn)
+            for fn, future in batch:
+                conn.execute("SAVEPOINT op")
+                try:
+                    results.append((future, fn(conn), None))
+                    conn.execute("RELEASE op")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO op")
+                    conn.execute("RELEASE op")
+                    results.append((future, None, e))
+                    failed += 1
+            conn.execute("COMMIT")
+        except Exception as e:
+            print(f"[DB-WRITER] Batch of {len(batch)} failed to commit: {e}")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            results = [(future, None, e) for _, future in batch]
+            failed = len(batch)
+        finally:
+            if not foreign_keys:
+                conn.execute("PRAGMA foreign_keys = ON")
+
+        with self.lock:
+            self.stats['batches'] += 1
+            self.stats['operations'] += len(batch)
+            self.stats['failed_operations'] += failed
+            self.stats['last_batch_size'] = len(batch)
+            self.stats['max_batch_size'] = max(self.stats['max_batch_size'], len(batch))
+            self.stats['commit_ms_total'] += (time.monotonic() - started) * 1000
+
+        # Resolve futures only once the batch is durable
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = DBWriter(DB_PATH)
+        return _writer
+
+def run_write(fn, foreign_keys=True, exclusive=False):
+    """Run fn(conn) on the single writer thread and wait for its committed result.
+
+    Exceptions raised by fn (e.g. sqlite3.IntegrityError) are re-raised here. Exclusive
+    operations can take as long as they need, so they're waited on without a timeout.
+    """
+    future = get_writer().submit(fn, foreign_keys, exclusive)
+    timeout = None if exclusive else WRITE_TIMEOUT_SECONDS
+    writes = getattr(_profile_state, 'writes', None)
+    if writes is None:
+        return future.result(timeout=timeout)
+    started = time.perf_counter()
+    try:
+        return future.result(timeout=timeout)
+    finally:
+        # The SQL runs on the writer thread, so a profile sees queue + commit wait time only
+        writes.append({"operation": fn.__qualname__,
+                       "ms": round((time.perf_counter() - started) * 1000, 3)})
+
+
+# ============ RESPONSE LAYER ============
+def requested_fields():
+    """Parse ?fields=a,b,c into a set of field names, or None when the client wants everything."""
+    raw = request.args.get('fields', '')
+    fields = {f.strip() for f in raw.split(',') if f.strip()}
+    return fields or None
+
+def select_list(columns, fields=None, required=('id',)):
+    """Build a SQL select list from (name, expression) pairs, restricted to the requested fields.
+
+    Columns in `required` are always selected because the route needs them (joins, filters,
+    scoring); project() trims them from the response afterwards if they weren't asked for.
+    """
+    chosen = [(name, expr) for name, expr in columns
+              if fields is None or name in fields or name in required]
+    return ', '.join(f"{expr} AS {name}" for name, expr in chosen)
+
+def project(row, fields):
+    """Trim a result dict down to the requested fields."""
+    if fields is None:
+        return row
+    return {k: v for k, v in row.items() if k in fields}
+
+def task_columns(*extra):
+    return [(c, f"t.{c}") for c in TASK_COLUMNS] + list(extra)
+
+@app.after_request
+def compress_response(response):
+    """gzip/deflate JSON and text responses above COMPRESS_MIN_BYTES when the client accepts it."""
+    if (response.direct_passthrough or response.status_code < 200 or response.status_code >= 300
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+
+    # Quality values, so "gzip;q=0" refuses gzip and "*" accepts both
+    gzip_q, deflate_q = request.accept_encodings['gzip'], request.accept_encodings['deflate']
+    if gzip_q > 0 and gzip_q >= deflate_q:
+        encoding, compress = 'gzip', lambda body: gzip.compress(body, compresslevel=6)
+    elif deflate_q > 0:
+        encoding, compress = 'deflate', lambda body: zlib.compress(body, 6)
+    else:
+        return response
+
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+    response.set_data(compress(body))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+# ============ PROFILING ============
+# Off unless a request carries `X-Profile: <DEBUG_TOKEN>` or is picked by PROFILE_SAMPLE_RATE
+# (sampling also needs DEBUG_TOKEN set, since only the token can read profiles back).
+# When off, the only cost is a header lookup here and one getattr in get_db().
+DEBUG_TOKEN = os.environ.get('DEBUG_TOKEN', '')
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_RING_SIZE = 50        # Recent profiles kept in memory for /api/_debug/profiles
+PROFILE_MAX_QUERIES = 500     # Statements recorded per profile; the rest are only counted
+PROFILE_TOP_FUNCTIONS = 25
+EXPLAINED_STATEMENTS = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+
+_profile_state = threading.local()  # .queries/.writes are lists only while this thread's request is profiled
+_profiles = deque(maxlen=PROFILE_RING_SIZE)
+_profile_ids = itertools.count(1)
+_profiler_lock = threading.Lock()   # One profiled request at a time keeps cProfile output unmixed
+
+class ProfiledCursor:
+    """Cursor wrapper that adds fetch time to its statement's record — SQLite does most of
+    the work while rows are stepped, not in execute()."""
+
+    def __init__(self, cursor, record):
+        self._cursor = cursor
+        self._record = record
+
+    def _timed(self, fn, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self._record['ms'] = round(self._record['ms'] + (time.perf_counter() - started) * 1000, 3)
+
+    def fetchone(self):
+        return self._timed(self._cursor.fetchone)
+
+    def fetchall(self):
+        return self._timed(self._cursor.fetchall)
+
+    def fetchmany(self, size=None):
+        return self._timed(self._cursor.fetchmany, size if size is not None else self._cursor.arraysize)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class ProfiledConnection:
+    """Connection wrapper handed out by get_db() during a profiled request. Records every
+    statement with its timing and EXPLAIN QUERY PLAN."""
+
+    def __init__(self, conn, queries):
+        self._conn = conn
+        self._queries = queries
+        self._plans = {}
+
+    def _explain(self, sql, params):
+        if not sql.lstrip().upper().startswith(EXPLAINED_STATEMENTS):
+            return None
+        if sql not in self._plans:
+            try:
+                rows = self._conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+                self._plans[sql] = [r[3] for r in rows]
+            except sqlite3.Error as e:
+                self._plans[sql] = [f"(explain failed: {e})"]
+        return self._plans[sql]
+
+    def execute(self, sql, params=()):
+        record = {"sql": ' '.join(sql.split()), "ms": 0.0}
+        started = time.perf_counter()
+        cursor = self._conn.execute(sql, params)
+        record['ms'] = round((time.perf_counter() - started) * 1000, 3)
+        if len(self._queries) < PROFILE_MAX_QUERIES:
+            record['plan'] = self._explain(sql, params)
+            self._queries.append(record)
+        else:
+            _profile_state.dropped_queries += 1
+        return ProfiledCursor(cursor, record)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+def debug_token_ok(token):
+    return bool(DEBUG_TOKEN) and token is not None and hmac.compare_digest(token, DEBUG_TOKEN)
+
+@app.before_request
+def guard_debug_routes():
+    """Once DEBUG_TOKEN is set, /api/_debug/* needs a matching X-Debug-Token header.
+
+    Profiles hold other users' paths, SQL and server file paths, so /api/_debug/profiles*
+    always needs a configured DEBUG_TOKEN.
+    """
+    if not request.path.startswith('/api/_debug/'):
+        return
+    if DEBUG_TOKEN or request.path.startswith('/api/_debug/profiles'):
+        if not debug_token_ok(request.headers.get('X-Debug-Token')):
+            return jsonify({"error": "Not authorised"}), 403
+
+@app.before_request
+def start_profile():
+    header = request.headers.get('X-Profile')
+    if header is not None:
+        if not debug_token_ok(header):
+            return
+        trigger = 'header'
+    elif DEBUG_TOKEN and PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        trigger = 'sample'
+    else:
+        return
+    if request.path.startswith('/api/_debug/') or not _profiler_lock.acquire(blocking=False):
+        return
+
+    _profile_state.queries = []
+    _profile_state.writes = []
+    _profile_state.dropped_queries = 0
+    _profile_state.trigger = trigger
+    _profile_state.started_at = datetime.now().isoformat(timespec='milliseconds')
+    _profile_state.started = time.perf_counter()
+    _profile_state.profiler = cProfile.Profile()
+    _profile_state.profiler.enable()
+
+def top_functions(stats, limit=PROFILE_TOP_FUNCTIONS):
+    """The functions with the most cumulative time, from a pstats.Stats."""
+    ranked = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [{"function": f"{func} ({os.path.basename(filename)}:{line})",
+             "calls": nc, "own_ms": round(tt * 1000, 3), "cumulative_ms": round(ct * 1000, 3)}
+            for (filename, line, func), (cc, nc, tt, ct, callers) in ranked]
+
+@app.after_request
+def finish_profile(response):
+    profiler = getattr(_profile_state, 'profiler', None)
+    if profiler is None:
+        return response
+    profiler.disable()
+    duration_ms = (time.perf_counter() - _profile_state.started) * 1000
+    stats = pstats.Stats(profiler)  # Takes ownership of the profiler's collected stats
+    queries = _profile_state.queries
+
+    profile = {
+        "id": next(_profile_ids),
+        "method": request.method,
+        "path": request.full_path.rstrip('?'),
+        "status": response.status_code,
+        "trigger": _profile_state.trigger,
+        "started_at": _profile_state.started_at,
+        "duration_ms": round(duration_ms, 3),
+        "sql_count": len(queries) + _profile_state.dropped_queries,
+        "sql_ms": round(sum(q['ms'] for q in queries), 3),
+        "write_ms": round(sum(w['ms'] for w in _profile_state.writes), 3),
+        "queries": queries,
+        "writes": _profile_state.writes,
+        "top_functions": top_functions(stats),
+        "pstats": marshal.dumps(stats.stats),  # Same format as Profile.dump_stats()
+    }
+    _profiles.append(profile)
+    response.headers['X-Profile-Id'] = str(profile['id'])
+    print(f"[PROFILE] #{profile['id']} {profile['method']} {profile['path']} "
+          f"{profile['duration_ms']:.1f}ms, {profile['sql_count']} queries ({profile['sql_ms']:.1f}ms)")
+    return response
+
+@app.teardown_request
+def reset_profile(error=None):
+    profiler = getattr(_profile_state, 'profiler', None)
+    if profiler is None:
+        return
+    profiler.disable()
+    _profile_state.profiler = None
+    _profile_state.queries = None
+    _profile_state.writes = None
+    _profiler_lock.release()
+
+
+# ============ IDEMPOTENCY ============
+# POST routes wrapped in @idempotent can be retried safely with an Idempotency-Key header: the
+# first request runs, repeats get its stored response back, and concurrent duplicates wait for
+# the first one instead of running the write again.
+IDEMPOTENCY_TTL_SECONDS = 24 * 3600   # How long a key's response is replayed
+IDEMPOTENCY_LEASE_SECONDS = 60        # A key still pending after this is treated as abandoned
+IDEMPOTENCY_CACHE_SIZE = 1024         # Recent responses kept in memory; older ones are read from the DB
+IDEMPOTENCY_POLL_SECONDS = 0.05       # Wait between checks on a key held by another process
+IDEMPOTENCY_RETRYABLE = {409, 429}    # Conflicts and rate limits can clear, so they aren't replayed
+
+_idempotency_cache = OrderedDict()    # scoped key -> stored response
+_idempotency_inflight = {}            # scoped key -> Event set when this process's holder finishes
+_idempotency_lock = threading.Lock()
+
+def _live_idempotency_row(conn, scoped):
+    """The key's row if it's still live — pending within its lease, or finished within the TTL."""
+    now = int(time.time())
+    row = conn.execute("""SELECT fingerprint, status_code, body, content_type, created_at
+                          FROM idempotency_keys WHERE key = ?""", (scoped,)).fetchone()
+    if row and (row['created_at'] >= now - IDEMPOTENCY_LEASE_SECONDS or
+                (row['status_code'] is not None and row['created_at'] >= now - IDEMPOTENCY_TTL_SECONDS)):
+        return dict(row)
+    return None
+
+def _claim_idempotency_row(conn, scoped, fingerprint):
+    """On the writer: return the live row for a key, or claim the key as pending and return None."""
+    row = _live_idempotency_row(conn, scoped)
+    if row:
+        return row
+    now = int(time.time())
+    conn.execute("""INSERT OR REPLACE INTO idempotency_keys (key, fingerprint, status_code, body, content_type, created_at)
+                    VALUES (?, ?, NULL, NULL, NULL, ?)""", (scoped, fingerprint, now))
+    return None
+
+def _cache_idempotent_response(scoped, stored):
+    with _idempotency_lock:
+        _idempotency_cache[scoped] = stored
+        _idempotency_cache.move_to_end(scoped)
+        while len(_idempotency_cache) > IDEMPOTENCY_CACHE_SIZE:
+            _idempotency_cache.popitem(last=False)
+
+def claim_idempotency_key(scoped, fingerprint):
+    """Returns (stored, None) for a finished key, (None, event) while another request holds it
+    — wait on the event and try again — or (None, None) once this request owns the key."""
+    with _idempotency_lock:
+        stored = _idempotency_cache.get(scoped)
+        if stored and stored['expires'] > time.time():
+            return stored, None
+        if scoped in _idempotency_inflight:
+            return None, _idempotency_inflight[scoped]
+
+    # Finished keys replay, and keys pending in another process are polled, from a read
+    # connection; only a missing or abandoned key goes through the writer to be claimed
+    conn = get_db()
+    row = _live_idempotency_row(conn, scoped)
+    conn.close()
+    if row is not None and row['status_code'] is None:
+        return None, threading.Event()  # Pending in another process — poll until it finishes
+    if row is None:
+        with _idempotency_lock:
+            if scoped in _idempotency_inflight:
+                return None, _idempotency_inflight[scoped]
+            event = _idempotency_inflight[scoped] = threading.Event()
+        try:
+            row = run_write(lambda wconn: _claim_idempotency_row(wconn, scoped, fingerprint))
+        except Exception:
+            finish_idempotency_key(scoped, None)
+            raise
+        if row is None:
+            return None, None
+        with _idempotency_lock:
+            _idempotency_inflight.pop(scoped, None)
+        event.set()
+        if row['status_code'] is None:
+            return None, threading.Event()  # Pending in another process — poll until it finishes
+
+    stored = {**row, 'expires': row['created_at'] + IDEMPOTENCY_TTL_SECONDS}
+    _cache_idempotent_response(scoped, stored)
+    return stored, None
+
+def finish_idempotency_key(scoped, fingerprint, response=None):
+    """Store the owner's response for replay, or release the key if it shouldn't be replayed."""
+    try:
+        if response is not None:
+            now = int(time.time())
+            stored = {'fingerprint': fingerprint, 'status_code': response.status_code,
+                      'body': response.get_data(), 'content_type': response.content_type,
+                      'created_at': now, 'expires': now + IDEMPOTENCY_TTL_SECONDS}
+            run_write(lambda conn: conn.execute(
+                """UPDATE idempotency_keys SET status_code = ?, body = ?, content_type = ?, created_at = ?
+                   WHERE key = ?""", (stored['status_code'], stored['body'], stored['content_type'], now, scoped)))
+            _cache_idempotent_response(scoped, stored)
+        else:
+            run_write(lambda conn: conn.execute(
+                "DELETE FROM idempotency_keys WHERE key = ? AND status_code IS NULL", (scoped,)))
+    finally:
+        with _idempotency_lock:
+            event = _idempotency_inflight.pop(scoped, None)
+        if event:
+            event.set()
+
+def idempotent(view):
+    """Make a POST route safe to retry with an Idempotency-Key header.
+
+    Responses below 500 are stored for IDEMPOTENCY_TTL_SECONDS and replayed with an
+    Idempotent-Replayed header. Server errors and IDEMPOTENCY_RETRYABLE statuses release the
+    key so the client can retry.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key', '').strip()
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > 255:
+            return jsonify({"error": "Idempotency-Key must be at most 255 characters"}), 400
+        scoped = f"{request.method} {request.path} {key}"
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+
+        deadline = time.monotonic() + WRITE_TIMEOUT_SECONDS
+        while True:
+            stored, waiter = claim_idempotency_key(scoped, fingerprint)
+            if stored:
+                if stored['fingerprint'] != fingerprint:
+                    return jsonify({"error": "Idempotency-Key was already used with a different request"}), 422
+                response = app.response_class(stored['body'], status=stored['status_code'],
+                                              content_type=stored['content_type'])
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+            if waiter is None:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return jsonify({"error": "A request with this Idempotency-Key is still in progress"}), 409
+            waiter.wait(min(remaining, IDEMPOTENCY_POLL_SECONDS))
+
+        try:
+            response = app.make_response(view(*args, **kwargs))
+        except Exception:
+            finish_idempotency_key(scoped, fingerprint)
+            raise
+        replayable = response.status_code < 500 and response.status_code not in IDEMPOTENCY_RETRYABLE
+        finish_idempotency_key(scoped, fingerprint, response if replayable else None)
+        return response
+    return wrapper
+
+
+# ============ BLOB STORE ============
+def blob_path(blob_id):
+    """On-disk location of a blob, fanned out by the first two hex digits of its hash."""
+    return os.path.join(BLOB_DIR, blob_id[:2], blob_id)
+
+def blob_url(blob_id, thumb=False):
+    if not blob_id:
+        return ''
+    return f"/api/blobs/{blob_id}/thumb" if thumb else f"/api/blobs/{blob_id}"
+
+def make_thumbnail(data):
+    """Return JPEG thumbnail bytes, or None when Pillow is missing or the image can't be decoded."""
+    if Image is None:
+        return None
+    try:
+        img = Image.open(io.BytesIO(data))
+        img.thumbnail(THUMBNAIL_SIZE)
+        out = io.BytesIO()
+        img.convert('RGB').save(out, format='JPEG', quality=80)
+        return out.getvalue()
+    except Exception as e:
+        print(f"[BLOB] Thumbnail generation failed: {e}")
+        return None
+
+def image_type(data):
+    """The image MIME type of data from its magic bytes — confirmed by Pillow when it's installed —
+    or None if it isn't a supported image. Client-supplied content types are never trusted."""
+    content_type = next((t for magic, t in BLOB_IMAGE_SIGNATURES if data.startswith(magic)), None)
+    if content_type is None and data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        content_type = 'image/webp'
+    if content_type is None or Image is None:
+        return content_type
+    try:
+        Image.open(io.BytesIO(data)).verify()
+    except Exception:
+        return None
+    return content_type
+
+def _write_blob_file(data):
+    blob_id = hashlib.sha256(data).hexdigest()
+    path = blob_path(blob_id)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return blob_id
+
+def save_blob_files(data):
+    """Write an image (and its thumbnail) to the content-addressed store on disk.
+
+    Identical content is deduplicated by hash; the thumbnail is only regenerated when the
+    recorded one is missing (no blobs row, no thumbnail yet, or its file is gone). Returns the
+    blob rows to record with register_blobs(), original first. Only reads the DB, so it can
+    run off the writer thread. Raises ValueError if data isn't a supported image.
+    """
+    content_type = image_type(data)
+    if content_type is None:
+        raise ValueError("Only JPEG, PNG, GIF and WebP images can be stored")
+    blob_id = hashlib.sha256(data).hexdigest()
+    conn = get_db()
+    existing = conn.execute("SELECT thumb_id FROM blobs WHERE id = ?", (blob_id,)).fetchone()
+    conn.close()
+    thumb_row = None
+    thumb_id = existing['thumb_id'] if existing else blob_id
+    if thumb_id != blob_id and os.path.exists(blob_path(thumb_id)):
+        thumb_row = (thumb_id, 'image/jpeg', os.path.getsize(blob_path(thumb_id)), thumb_id)
+    else:
+        thumb = make_thumbnail(data)
+        if thumb is not None:
+            thumb_id = _write_blob_file(thumb)
+            thumb_row = (thumb_id, 'image/jpeg', len(thumb), thumb_id)
+    _write_blob_file(data)
+    rows = [(blob_id, content_type, len(data), thumb_row[0] if thumb_row else blob_id)]
+    if thumb_row:
+        rows.append(thumb_row)
+    return rows
+
+def register_blobs(conn, rows):
+    """Record blob rows from save_blob_files() and return the original's blob id."""
+    conn.executemany("""INSERT INTO blobs (id, content_type, size, thumb_id) VALUES (?, ?, ?, ?)
+                          ON CONFLICT (id) DO UPDATE SET thumb_id = excluded.thumb_id
+                          WHERE excluded.thumb_id != blobs.thumb_id""", rows)
+    return rows[0][0]
+
+def blob_exists(conn, blob_id):
+    """Whether a client-supplied blob id names a stored blob."""
+    return conn.execute("SELECT 1 FROM blobs WHERE id = ?", (blob_id,)).fetchone() is not None
+
+def store_blob(conn, data):
+    """Store an image in the blob store and return the blob id (sha256 hex).
+    The caller is responsible for committing the connection."""
+    return register_blobs(conn, save_blob_files(data))
+
+def parse_data_url(value):
+    """Split a base64 data URL into (bytes, content_type). Returns (None, None) for anything else."""
+    if not value or not value.startswith('data:') or ',' not in value:
+        return None, None
+    header, payload = value.split(',', 1)
+    if ';base64' not in header:
+        return None, None
+    content_type = header[5:].split(';')[0] or 'application/octet-stream'
+    try:
+        return base64.b64decode(payload), content_type
+    except (ValueError, TypeError):
+        return None, None
+
+def save_data_url_files(value):
+    """save_blob_files() for an inline base64 data URL. Returns [] unless value is an image data URL."""
+    data, content_type = parse_data_url(value)
+    if data is None:
+        return []
+    try:
+        return save_blob_files(data)
+    except ValueError as e:
+        print(f"[BLOB] Ignored inline {content_type} data URL: {e}")
+        return []
+
+def store_data_url(conn, value):
+    """Move an inline base64 data URL into the blob store. Returns the blob id, or '' if not a data URL."""
+    rows = save_data_url_files(value)
+    return register_blobs(conn, rows) if rows else ''
+
+def migrate_inline_images(conn):
+    """Move base64 images still held inline in table rows into the blob store."""
+    moved = 0
+    rows = conn.execute("SELECT id FROM tasks WHERE completion_photo LIKE 'data:%'").fetchall()
+    for row in rows:
+        photo = conn.execute("SELECT completion_photo FROM tasks WHERE id = ?", (row['id'],)).fetchone()
+        blob_id = store_data_url(conn, photo['completion_photo'])
+        conn.execute("UPDATE tasks SET completion_photo = '', completion_photo_id = ? WHERE id = ?",
+                     (blob_id, row['id']))
+        moved += 1
+    rows = conn.execute("SELECT id FROM community_posts WHERE image_url LIKE 'data:%'").fetchall()
+    for row in rows:
+        post = conn.execute("SELECT image_url FROM community_posts WHERE id = ?", (row['id'],)).fetchone()
+        blob_id = store_data_url(conn, post['image_url'])
+        conn.execute("UPDATE community_posts SET image_url = ?, image_blob_id = ? WHERE id = ?",
+                     (blob_url(blob_id), blob_id, row['id']))
+        moved += 1
+    if moved:
+        print(f"[BLOB] Migrated {moved} inline image(s) to the blob store")
+    return moved
+
+def add_column_if_missing(conn, table, column, definition):
+    columns = {r['name'] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def drop_task_foreign_key(conn, table):
+    """Rebuild table without its FOREIGN KEY on task_id — SQLite can't drop a constraint in place.
+
+    For tables whose rows may point at tasks that have moved to tasks_archive. Indexes and
+    triggers on the table are dropped with it, so call this before they're (re)created.
+    """
+    if not any(fk['table'] == 'tasks' for fk in conn.execute(f"PRAGMA foreign_key_list({table})").fetchall()):
+        return
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()[0]
+    sql = re.sub(r",\s*FOREIGN KEY\s*\(task_id\)\s*REFERENCES tasks\s*\(id\)", "", sql)
+    sql = re.sub(rf"^CREATE TABLE\s+(IF NOT EXISTS\s+)?\"?{table}\"?", f"CREATE TABLE {table}_rebuild", sql)
+    columns = ', '.join(r['name'] for r in conn.execute(f"PRAGMA table_info({table})").fetchall())
+    seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+
+    conn.commit()
+    conn.execute("PRAGMA foreign_keys = OFF")
+    try:
+        conn.executescript(f"""
+            BEGIN;
+            {sql};
+            INSERT INTO {table}_rebuild ({columns}) SELECT {columns} FROM {table};
+            DROP TABLE {table};
+            ALTER TABLE {table}_rebuild RENAME TO {table};
+            COMMIT;
+        """)
+        if seq:  # Keep AUTOINCREMENT above ids already used by archived rows
+            conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (seq[0], table))
+            conn.commit()
+    finally:
+        conn.execute("PRAGMA foreign_keys = ON")
+    print(f"[MIGRATION] Dropped the tasks foreign key from {table}")
+
+
 def init_db():
     conn = get_db()
+    # WAL lets readers keep going while the writer thread commits
+    conn.execute("PRAGMA journal_mode = WAL")
     c = conn.cursor()
 
     c.executescript('''
@@ -118,9 +946,12 @@ def init_db():
             scheduled_date TEXT DEFAULT '',
             scheduled_time TEXT DEFAULT '',
             completion_photo TEXT DEFAULT '',
+            completion_photo_id TEXT DEFAULT '',
             completion_notes TEXT DEFAULT '',
             created_at TEXT DEFAULT (datetime('now')),
             completed_at TEXT DEFAULT NULL,
+            start_ts INTEGER,
+            end_ts INTEGER,
             FOREIGN KEY (posted_by) REFERENCES users(id),
             FOREIGN KEY (assigned_to) REFERENCES users(id)
         );
@@ -140,6 +971,8 @@ def init_db():
             start_time TEXT NOT NULL,
             end_time TEXT NOT NULL,
             city TEXT DEFAULT '',
+            start_ts INTEGER,
+            end_ts INTEGER,
             FOREIGN KEY (user_id) REFERENCES users(id)
         );
 
@@ -149,10 +982,10 @@ def init_db():
             task_id INTEGER DEFAULT NULL,
             content TEXT NOT NULL,
             image_url TEXT DEFAULT '',
+            image_blob_id TEXT DEFAULT '',
             created_at TEXT DEFAULT (datetime('now')),
             likes INTEGER DEFAULT 0,
-            FOREIGN KEY (user_id) REFERENCES users(id),
-            FOREIGN KEY (task_id) REFERENCES tasks(id)
+            FOREIGN KEY (user_id) REFERENCES users(id)
         );
 
         CREATE TABLE IF NOT EXISTS achievements (
@@ -178,8 +1011,110 @@ def init_db():
             FOREIGN KEY (user_id) REFERENCES users(id),
             FOREIGN KEY (task_id) REFERENCES tasks(id)
         );
+
+        CREATE TABLE IF NOT EXISTS impact_rollups (
+            user_id INTEGER NOT NULL,       -- 0 = all users
+            city TEXT NOT NULL,             -- '*' = all cities
+            year_month TEXT NOT NULL,       -- 'YYYY-MM'
+            hours REAL DEFAULT 0,
+            items_fixed INTEGER DEFAULT 0,
+            bags_collected INTEGER DEFAULT 0,
+            people_helped INTEGER DEFAULT 0,
+            carbon_saved_kg REAL DEFAULT 0.0,
+            reports INTEGER DEFAULT 0,
+            PRIMARY KEY (user_id, city, year_month)
+        );
+
+        CREATE TABLE IF NOT EXISTS achievement_counters (
+            user_id INTEGER PRIMARY KEY,
+            distinct_skills INTEGER DEFAULT 0,
+            current_streak INTEGER DEFAULT 0,   -- consecutive weeks with a completed task
+            longest_streak INTEGER DEFAULT 0,
+            last_active_week TEXT DEFAULT '',   -- ISO date of the Monday of the last active week
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        );
+
+        CREATE TABLE IF NOT EXISTS achievement_skills_used (
+            user_id INTEGER,
+            skill_id INTEGER,
+            PRIMARY KEY (user_id, skill_id),
+            FOREIGN KEY (user_id) REFERENCES users(id),
+            FOREIGN KEY (skill_id) REFERENCES skills(id)
+        );
+
+        CREATE TABLE IF NOT EXISTS task_signatures (
+            task_id INTEGER PRIMARY KEY,
+            city TEXT,
+            signature BLOB,
+            FOREIGN KEY (task_id) REFERENCES tasks(id)
+        );
+
+        CREATE TABLE IF NOT EXISTS task_lsh_buckets (
+            city TEXT,
+            band INTEGER,
+            bucket INTEGER,
+            task_id INTEGER,
+            PRIMARY KEY (city, band, bucket, task_id)
+        ) WITHOUT ROWID;
+
+        CREATE TABLE IF NOT EXISTS task_tiles (
+            zoom INTEGER,
+            skill_id INTEGER,
+            status TEXT,
+            tile_x INTEGER,
+            tile_y INTEGER,
+            tasks INTEGER DEFAULT 0,
+            lat_sum REAL DEFAULT 0,
+            lon_sum REAL DEFAULT 0,
+            PRIMARY KEY (zoom, skill_id, status, tile_x, tile_y)
+        ) WITHOUT ROWID;
+
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            key TEXT PRIMARY KEY,
+            fingerprint TEXT,
+            status_code INTEGER,
+            body BLOB,
+            content_type TEXT,
+            created_at INTEGER
+        );
+
+        CREATE TABLE IF NOT EXISTS sync_sequence (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            value INTEGER NOT NULL DEFAULT 0,     -- Last change sequence handed out
+            horizon INTEGER NOT NULL DEFAULT 0    -- Tombstones at or below this have been purged
+        );
+
+        CREATE TABLE IF NOT EXISTS sync_tombstones (
+            seq INTEGER PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            deleted_at TEXT DEFAULT (datetime('now'))
+        );
+
+        CREATE TABLE IF NOT EXISTS blobs (
+            id TEXT PRIMARY KEY,
+            content_type TEXT DEFAULT 'application/octet-stream',
+            size INTEGER DEFAULT 0,
+            thumb_id TEXT DEFAULT '',
+            created_at TEXT DEFAULT (datetime('now'))
+        );
     ''')
 
+    # Migrations for databases created before these columns existed
+    add_column_if_missing(conn, 'tasks', 'completion_photo_id', "TEXT DEFAULT ''")
+    add_column_if_missing(conn, 'community_posts', 'image_blob_id', "TEXT DEFAULT ''")
+    migrate_inline_images(conn)
+    add_column_if_missing(conn, 'availability', 'start_ts', "INTEGER")
+    add_column_if_missing(conn, 'availability', 'end_ts', "INTEGER")
+    add_column_if_missing(conn, 'tasks', 'start_ts', "INTEGER")
+    add_column_if_missing(conn, 'tasks', 'end_ts', "INTEGER")
+    add_column_if_missing(conn, 'tasks', 'duplicate_of', "INTEGER")
+    for table in SYNCED_TABLES:
+        add_column_if_missing(conn, table, 'updated_at', "TEXT")
+        add_column_if_missing(conn, table, 'change_seq', "INTEGER")
+    # Posts can be written about tasks that have already been archived
+    drop_task_foreign_key(conn, 'community_posts')
+
     # Seed skills
     skills = ['Heavy Lifting', 'Tech Help', 'Gardening', 'Transportation',
               'Cleaning', 'Cooking', 'Tutoring', 'Pet Care', 'Repairs', 'Arts & Crafts', 'Others']
@@ -280,10 +1215,595 @@ def init_db():
         for a in avail:
             c.execute("INSERT INTO availability (user_id, date, start_time, end_time, city) VALUES (?,?,?,?,?)", a)
 
+    backfill_intervals(conn)
+    for table in ARCHIVED_TABLES:
+        ensure_archive_table(conn, table)
+    c.executescript("""
+        CREATE INDEX IF NOT EXISTS idx_availability_city_start ON availability (city, start_ts);
+        CREATE INDEX IF NOT EXISTS idx_availability_start ON availability (start_ts);
+        CREATE INDEX IF NOT EXISTS idx_tasks_assignee_start ON tasks (assigned_to, start_ts);
+        CREATE INDEX IF NOT EXISTS idx_tasks_archive_posted_by ON tasks_archive (posted_by);
+        CREATE INDEX IF NOT EXISTS idx_lsh_buckets_task ON task_lsh_buckets (task_id);
+        CREATE INDEX IF NOT EXISTS idx_idempotency_created ON idempotency_keys (created_at);
+        CREATE INDEX IF NOT EXISTS idx_tombstones_table_seq ON sync_tombstones (table_name, seq);
+        INSERT OR IGNORE INTO sync_sequence (id, value, horizon) VALUES (1, 0, 0);
+    """)
+    for table in SYNCED_TABLES:
+        backfill_change_seq(conn, table)
+        ensure_sync_triggers(conn, table)
+
+    # Build rollups for impact reports recorded before the rollup table existed
+    if not c.execute("SELECT 1 FROM impact_rollups LIMIT 1").fetchone():
+        backfill_impact_rollups(conn)
+
+    # Badges are awarded at most once per user
+    c.execute("""DELETE FROM achievements WHERE id NOT IN
+                 (SELECT MIN(id) FROM achievements GROUP BY user_id, badge_name)""")
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_achievements_user_badge ON achievements (user_id, badge_name)")
+    if not c.execute("SELECT 1 FROM achievement_counters LIMIT 1").fetchone():
+        rebuild_achievement_counters(conn)
+    if not c.execute("SELECT 1 FROM task_signatures LIMIT 1").fetchone():
+        rebuild_duplicate_index(conn)
+    if not c.execute("SELECT 1 FROM task_tiles LIMIT 1").fetchone():
+        rebuild_task_tiles(conn)
+
     conn.commit()
     conn.close()
 
 
+# ============ TIME INTERVALS ============
+# Availability slots and scheduled tasks are also stored as [start_ts, end_ts) epoch-second
+# intervals (wall-clock times read as UTC) so overlap queries are plain indexed range scans.
+MAX_SLOT_SECONDS = 24 * 3600  # Slots never exceed a day, which bounds the start_ts range to scan
+
+def to_epoch(date_str, time_str='00:00'):
+    """'YYYY-MM-DD' + 'HH:MM' -> epoch seconds, or None if either part is missing/invalid."""
+    try:
+        return calendar.timegm(datetime.strptime(f"{date_str} {time_str or '00:00'}", '%Y-%m-%d %H:%M').timetuple())
+    except (TypeError, ValueError):
+        return None
+
+def slot_interval(date_str, start_time, end_time):
+    start = to_epoch(date_str, start_time)
+    end = to_epoch(date_str, end_time)
+    if start is None or end is None:
+        return None, None
+    if end <= start:
+        end += 24 * 3600  # Slot runs past midnight
+    return start, end
+
+def task_interval(scheduled_date, scheduled_time, duration_minutes):
+    start = to_epoch(scheduled_date, scheduled_time)
+    if start is None:
+        return None, None
+    return start, start + int(duration_minutes or 60) * 60
+
+def parse_time_param(value):
+    """Accept epoch seconds or 'YYYY-MM-DDTHH:MM' / 'YYYY-MM-DD HH:MM'."""
+    if not value:
+        return None
+    if value.isdigit():
+        return int(value)
+    date_part, _, time_part = value.replace('T', ' ').partition(' ')
+    return to_epoch(date_part, time_part[:5] or '00:00')
+
+def backfill_intervals(conn):
+    """Fill start_ts/end_ts for rows written before the interval columns existed."""
+    conn.execute("""
+        UPDATE availability SET
+            start_ts = CAST(strftime('%s', date || ' ' || start_time) AS INTEGER),
+            end_ts = CAST(strftime('%s', date || ' ' || end_time) AS INTEGER)
+                     + CASE WHEN end_time <= start_time THEN 86400 ELSE 0 END
+        WHERE start_ts IS NULL AND date != '' AND start_time != '' AND end_time != ''
+    """)
+    conn.execute("""
+        UPDATE tasks SET
+            start_ts = CAST(strftime('%s', scheduled_date || ' ' || COALESCE(NULLIF(scheduled_time, ''), '00:00')) AS INTEGER),
+            end_ts = CAST(strftime('%s', scheduled_date || ' ' || COALESCE(NULLIF(scheduled_time, ''), '00:00')) AS INTEGER)
+                     + COALESCE(duration_minutes, 60) * 60
+        WHERE start_ts IS NULL AND scheduled_date != ''
+    """)
+
+def find_schedule_conflict(conn, user_id, start_ts, end_ts, exclude_task_id=None):
+    """Return the first accepted task assigned to user_id that overlaps [start_ts, end_ts), or None."""
+    if start_ts is None:
+        return None
+    return conn.execute("""
+        SELECT id, title, scheduled_date, scheduled_time FROM tasks
+        WHERE assigned_to = ? AND status = 'accepted' AND id != ?
+          AND start_ts < ? AND end_ts > ?
+        LIMIT 1
+    """, (user_id, exclude_task_id or 0, end_ts, start_ts)).fetchone()
+
+
+# ============ ARCHIVE ============
+# Cold rows (old completed tasks, expired availability, old posts) live in <table>_archive tables
+# with the same columns, keeping the hot tables small. Read endpoints opt in with ?include_archived=true.
+ARCHIVED_TABLES = ['tasks', 'availability', 'community_posts']
+
+def ensure_archive_table(conn, table):
+    """Create <table>_archive if needed and add any columns the live table has gained since."""
+    archive = f"{table}_archive"
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {archive} AS SELECT * FROM {table} WHERE 0")
+    conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{archive}_id ON {archive} (id)")
+    add_column_if_missing(conn, archive, 'archived_at', "TEXT")
+    archive_columns = {r['name'] for r in conn.execute(f"PRAGMA table_info({archive})").fetchall()}
+    for r in conn.execute(f"PRAGMA table_info({table})").fetchall():
+        if r['name'] not in archive_columns:
+            conn.execute(f"ALTER TABLE {archive} ADD COLUMN {r['name']} {r['type']}")
+
+def include_archived(default=False):
+    return request.args.get('include_archived', 'true' if default else 'false') == 'true'
+
+def table_source(table, columns, archived=False):
+    """FROM-clause source for `table`, unioned with its archive when archived=True."""
+    if not archived:
+        return table
+    cols = ', '.join(columns)
+    return f"(SELECT {cols} FROM {table} UNION ALL SELECT {cols} FROM {table}_archive)"
+
+def _move_to_archive(conn, table, where, params=()):
+    ids = [r[0] for r in conn.execute(f"SELECT id FROM {table} WHERE {where}", params).fetchall()]
+    if not ids:
+        return 0
+    columns = ', '.join(r['name'] for r in conn.execute(f"PRAGMA table_info({table})").fetchall())
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        marks = ','.join('?' * len(chunk))
+        conn.execute(f"""INSERT OR REPLACE INTO {table}_archive ({columns}, archived_at)
+                         SELECT {columns}, datetime('now') FROM {table} WHERE id IN ({marks})""", chunk)
+        conn.execute(f"DELETE FROM {table} WHERE id IN ({marks})", chunk)
+    return len(ids)
+
+def archive_cold_rows(conn, task_days=TASK_ARCHIVE_AFTER_DAYS, post_days=POST_ARCHIVE_AFTER_DAYS):
+    """Move cold rows into the archive tables. Returns {table: rows moved}.
+
+    Must run with foreign_keys OFF: impact_reports, task_skills and community_posts keep
+    pointing at archived task ids, and readers fall back to tasks_archive for those.
+    """
+    for table in ARCHIVED_TABLES:
+        ensure_archive_table(conn, table)
+    cold_tasks = ("status = 'completed' AND completed_at < datetime('now', ?)", (f'-{int(task_days)} days',))
+    for row in conn.execute(f"SELECT id FROM tasks WHERE {cold_tasks[0]}", cold_tasks[1]).fetchall():
+        update_task_tiles(conn, row['id'], 'completed', -1)
+    return {
+        'tasks': _move_to_archive(conn, 'tasks', *cold_tasks),
+        'availability': _move_to_archive(conn, 'availability', "end_ts < CAST(strftime('%s', 'now') AS INTEGER)"),
+        'community_posts': _move_to_archive(conn, 'community_posts', "created_at < datetime('now', ?)",
+                                            (f'-{int(post_days)} days',)),
+    }
+
+_last_maintenance = {}
+
+def run_maintenance():
+    """Archive cold rows, then reclaim space and refresh planner statistics.
+
+    Everything runs on the writer thread: archival as a normal write (with foreign keys off,
+    see archive_cold_rows), then VACUUM/ANALYZE as an exclusive operation, since VACUUM can't
+    run inside a transaction. Writes queue up behind it instead of failing on the lock.
+    Returns a report of what it did.
+    """
+    started = time.monotonic()
+
+    def archive(conn):
+        return (conn.execute("PRAGMA page_count").fetchone()[0],
+                archive_cold_rows(conn),
+                conn.execute("DELETE FROM idempotency_keys WHERE created_at < ?",
+                             (int(time.time()) - IDEMPOTENCY_TTL_SECONDS,)).rowcount,
+                purge_tombstones(conn))
+
+    def vacuum_and_analyze(conn):
+        freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            # One-off conversion to incremental auto-vacuum needs a full VACUUM
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            mode = 'full'
+        else:
+            conn.execute("PRAGMA incremental_vacuum").fetchall()
+            mode = 'incremental'
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA optimize")
+        return freelist, mode, conn.execute("PRAGMA page_count").fetchone()[0]
+
+    pages_before, archived, expired_keys, purged_tombstones = run_write(archive, foreign_keys=False)
+    freelist_before, vacuum, pages_after = run_write(vacuum_and_analyze, exclusive=True)
+
+    report = {
+        'ran_at': datetime.now().isoformat(timespec='seconds'),
+        'duration_ms': round((time.monotonic() - started) * 1000, 1),
+        'archived': archived,
+        'expired_idempotency_keys': expired_keys,
+        'purged_tombstones': purged_tombstones,
+        'vacuum': vacuum,
+        'free_pages_before_vacuum': freelist_before,
+        'pages_before': pages_before,
+        'pages_after': pages_after,
+        'reclaimed_pages': max(pages_before - pages_after, 0),
+    }
+    _last_maintenance.clear()
+    _last_maintenance.update(report)
+    print(f"[MAINTENANCE] {report}")
+    return report
+
+def start_maintenance_scheduler():
+    """Run maintenance every MAINTENANCE_INTERVAL_SECONDS on a daemon thread (0 disables it)."""
+    if MAINTENANCE_INTERVAL_SECONDS <= 0:
+        return
+
+    def loop():
+        while True:
+            time.sleep(MAINTENANCE_INTERVAL_SECONDS)
+            try:
+                run_maintenance()
+            except Exception as e:
+                print(f"[MAINTENANCE-ERROR] {e}")
+
+    threading.Thread(target=loop, name='maintenance', daemon=True).start()
+
+
+# ============ IMPACT ROLLUPS ============
+ALL_USERS = 0
+ALL_CITIES = '*'
+ROLLUP_METRICS = ['hours', 'items_fixed', 'bags_collected', 'people_helped', 'carbon_saved_kg', 'reports']
+
+def record_impact(conn, user_id, task_id, hours, people_helped, carbon_saved_kg, notes, city='',
+                  items_fixed=0, bags_collected=0):
+    """Insert an impact report and fold it into the monthly rollups.
+
+    Each report updates four rollup rows — (user, city), (user, all cities), (all users, city)
+    and (all users, all cities) — so every timeseries query reads exactly one row per month.
+    A report without a user only updates the all-users rows.
+    """
+    conn.execute("""INSERT INTO impact_reports (user_id, task_id, hours_logged, items_fixed, bags_collected,
+                    people_helped, carbon_saved_kg, notes) VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                 (user_id, task_id, hours, items_fixed, bags_collected, people_helped, carbon_saved_kg, notes))
+    for uid, c in ((user_id, city or ''), (user_id, ALL_CITIES), (ALL_USERS, city or ''), (ALL_USERS, ALL_CITIES)):
+        if uid is None:
+            continue
+        conn.execute("""
+            INSERT INTO impact_rollups (user_id, city, year_month, hours, items_fixed, bags_collected,
+                                        people_helped, carbon_saved_kg, reports)
+            VALUES (?, ?, strftime('%Y-%m', 'now'), ?, ?, ?, ?, ?, 1)
+            ON CONFLICT (user_id, city, year_month) DO UPDATE SET
+                hours = hours + excluded.hours,
+                items_fixed = items_fixed + excluded.items_fixed,
+                bags_collected = bags_collected + excluded.bags_collected,
+                people_helped = people_helped + excluded.people_helped,
+                carbon_saved_kg = carbon_saved_kg + excluded.carbon_saved_kg,
+                reports = reports + 1
+        """, (uid, c, hours, items_fixed, bags_collected, people_helped, carbon_saved_kg))
+
+def backfill_impact_rollups(conn):
+    """Rebuild impact_rollups from scratch out of impact_reports. Returns the number of rollup rows."""
+    conn.execute("DELETE FROM impact_rollups")
+    sums = """SUM(ir.hours_logged), SUM(ir.items_fixed), SUM(ir.bags_collected),
+              SUM(ir.people_helped), SUM(ir.carbon_saved_kg), COUNT(*)"""
+    source = """FROM impact_reports ir LEFT JOIN tasks t ON ir.task_id = t.id
+                LEFT JOIN tasks_archive ta ON ir.task_id = ta.id"""
+    month = "strftime('%Y-%m', ir.created_at)"
+    city = "COALESCE(t.city, ta.city, '')"
+    per_user = "WHERE ir.user_id IS NOT NULL"
+    for user_expr, city_expr, where in (("ir.user_id", city, per_user), ("ir.user_id", "'*'", per_user),
+                                        ("0", city, ""), ("0", "'*'", "")):
+        conn.execute(f"""
+            INSERT INTO impact_rollups (user_id, city, year_month, hours, items_fixed, bags_collected,
+                                        people_helped, carbon_saved_kg, reports)
+            SELECT {user_expr}, {city_expr}, {month}, {sums} {source}
+            {where}
+            GROUP BY 1, 2, 3
+        """)
+    count = conn.execute("SELECT COUNT(*) FROM impact_rollups").fetchone()[0]
+    print(f"[ROLLUPS] Backfilled {count} impact rollup row(s)")
+    return count
+
+
+# ============ DUPLICATE DETECTION ============
+# Open tasks are indexed by a MinHash signature of their title + description, cut into LSH
+# bands. A new task is only compared with open tasks in its city that share a band bucket —
+# LSH_BANDS indexed seeks per insert rather than a comparison against every open task.
+MINHASH_PERMUTATIONS = 60
+LSH_BANDS = 20                 # 20 bands of 3 rows: pairs at 0.6 similarity share a bucket >99% of the time
+LSH_ROWS = MINHASH_PERMUTATIONS // LSH_BANDS
+SHINGLE_SIZE = 4               # Character shingles, so a reworded phrase only changes a few of them
+DUPLICATE_THRESHOLD = 0.6      # Estimated Jaccard similarity at which a task is flagged as a duplicate
+MERGE_THRESHOLD = 0.9          # ...and at which a poster's own repost is merged into their open task
+_MERSENNE_PRIME = (1 << 61) - 1
+
+# Fixed seed — signatures are stored, so the hash functions must be identical across restarts
+_minhash_rng = random.Random(20260214)
+MINHASH_PARAMS = [(_minhash_rng.randrange(1, _MERSENNE_PRIME), _minhash_rng.randrange(_MERSENNE_PRIME))
+                  for _ in range(MINHASH_PERMUTATIONS)]
+
+def shingles(text):
+    """Character shingles of text, lower-cased with punctuation and extra whitespace removed."""
+    normalised = ' '.join(''.join(ch if ch.isalnum() else ' ' for ch in text.lower()).split())
+    if len(normalised) <= SHINGLE_SIZE:
+        return {normalised} if normalised else set()
+    return {normalised[i:i + SHINGLE_SIZE] for i in range(len(normalised) - SHINGLE_SIZE + 1)}
+
+def minhash_signature(title, description):
+    """MinHash signature of a task's text, or None when there is no text to compare."""
+    hashes = [zlib.crc32(s.encode()) for s in shingles(f"{title or ''} {description or ''}")]
+    if not hashes:
+        return None
+    return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in MINHASH_PARAMS]
+
+def lsh_buckets(signature):
+    """(band, bucket) pairs for a signature — one 64-bit bucket hash per band."""
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        digest = hashlib.blake2b(struct.pack(f'<{LSH_ROWS}Q', *rows), digest_size=8).digest()
+        yield band, int.from_bytes(digest, 'little', signed=True)
+
+def signature_similarity(a, b):
+    """Estimated Jaccard similarity: the fraction of MinHash values two signatures share."""
+    return sum(x == y for x, y in zip(a, b)) / MINHASH_PERMUTATIONS
+
+def find_duplicate_tasks(conn, city, signature, exclude_task_id=None):
+    """Open tasks in city that look like near-duplicates of signature, most similar first."""
+    if signature is None:
+        return []
+    buckets = list(lsh_buckets(signature))
+    candidates = conn.execute(f"""
+        SELECT t.id, t.title, t.posted_by, s.signature
+        FROM task_signatures s JOIN tasks t ON t.id = s.task_id
+        WHERE s.task_id IN (
+            SELECT b.task_id FROM (VALUES {', '.join(['(?, ?)'] * len(buckets))}) v
+            JOIN task_lsh_buckets b ON b.city = ? AND b.band = v.column1 AND b.bucket = v.column2
+        ) AND t.status = 'open' AND t.id != ?
+    """, [*(v for pair in buckets for v in pair), city, exclude_task_id or 0]).fetchall()
+
+    duplicates = []
+    for row in candidates:
+        similarity = signature_similarity(signature, struct.unpack(f'<{MINHASH_PERMUTATIONS}Q', row['signature']))
+        if similarity >= DUPLICATE_THRESHOLD:
+            duplicates.append({"id": row['id'], "title": row['title'], "posted_by": row['posted_by'],
+                               "similarity": round(similarity, 2)})
+    duplicates.sort(key=lambda d: d['similarity'], reverse=True)
+    return duplicates
+
+def index_task(conn, task_id, city, signature):
+    """Add an open task to the duplicate index."""
+    if signature is None:
+        return
+    conn.execute("INSERT OR REPLACE INTO task_signatures (task_id, city, signature) VALUES (?, ?, ?)",
+                 (task_id, city, struct.pack(f'<{MINHASH_PERMUTATIONS}Q', *signature)))
+    conn.executemany("INSERT OR IGNORE INTO task_lsh_buckets (city, band, bucket, task_id) VALUES (?, ?, ?, ?)",
+                     [(city, band, bucket, task_id) for band, bucket in lsh_buckets(signature)])
+
+def unindex_task(conn, task_id):
+    """Drop a task from the duplicate index once it's no longer open."""
+    conn.execute("DELETE FROM task_lsh_buckets WHERE task_id = ?", (task_id,))
+    conn.execute("DELETE FROM task_signatures WHERE task_id = ?", (task_id,))
+
+def rebuild_duplicate_index(conn):
+    """Rebuild the duplicate index from every open task. Returns the number of tasks indexed."""
+    conn.execute("DELETE FROM task_lsh_buckets")
+    conn.execute("DELETE FROM task_signatures")
+    tasks = conn.execute("SELECT id, city, title, description FROM tasks WHERE status = 'open'").fetchall()
+    for t in tasks:
+        index_task(conn, t['id'], t['city'], minhash_signature(t['title'], t['description']))
+    print(f"[DEDUPE] Indexed {len(tasks)} open task(s)")
+    return len(tasks)
+
+
+# ============ MAP TILES ============
+# task_tiles holds task counts and coordinate sums per Web Mercator tile, for every zoom level,
+# skill (ANY_SKILL = all tasks) and status. It's kept up to date as tasks are created, change
+# status and get archived, so /api/tasks/clusters only ever reads the tiles in the viewport.
+ANY_SKILL = 0
+TASK_STATUSES = ('open', 'accepted', 'completed')
+CLUSTER_MAX_ZOOM = 18
+CLUSTER_ZOOM_OFFSET = 2      # Cluster cells are 1/4 of a map tile across (64px on 256px tiles)
+MAX_CLUSTER_CELLS = 1024     # Viewports covering more cells than this get coarser cells
+MAX_MERCATOR_LAT = 85.05112878
+
+def tile_xy(lat, lon, zoom):
+    """The slippy-map tile (x, y) containing a point at a zoom level."""
+    n = 1 << zoom
+    lat = math.radians(max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, lat)))
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(lat)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+def quadkey(x, y, zoom):
+    """Bing-style quadkey for a tile, e.g. '0313' at zoom 4."""
+    return ''.join(str((1 if x >> i & 1 else 0) + (2 if y >> i & 1 else 0)) for i in range(zoom - 1, -1, -1))
+
+def update_task_tiles(conn, task_id, status, delta):
+    """Add (delta=1) or remove (delta=-1) a task from the tile aggregates for a status."""
+    task = conn.execute("SELECT latitude, longitude FROM tasks WHERE id = ?", (task_id,)).fetchone()
+    if not task or task['latitude'] is None or task['longitude'] is None:
+        return
+    lat, lon = task['latitude'], task['longitude']
+    skill_ids = [r['skill_id'] for r in conn.execute("SELECT skill_id FROM task_skills WHERE task_id = ?",
+                                                      (task_id,)).fetchall()]
+    keys = [(zoom, skill_id, status, *tile_xy(lat, lon, zoom))
+            for zoom in range(CLUSTER_MAX_ZOOM + 1) for skill_id in (ANY_SKILL, *skill_ids)]
+    conn.executemany("""
+        INSERT INTO task_tiles (zoom, skill_id, status, tile_x, tile_y, tasks, lat_sum, lon_sum)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (zoom, skill_id, status, tile_x, tile_y) DO UPDATE SET
+            tasks = tasks + excluded.tasks,
+            lat_sum = lat_sum + excluded.lat_sum,
+            lon_sum = lon_sum + excluded.lon_sum
+    """, [(*key, delta, delta * lat, delta * lon) for key in keys])
+    if delta < 0:
+        conn.executemany("""DELETE FROM task_tiles WHERE zoom = ? AND skill_id = ? AND status = ?
+                            AND tile_x = ? AND tile_y = ? AND tasks <= 0""", keys)
+
+def move_task_tiles(conn, task_id, old_status, new_status):
+    """Re-file a task under its new status after a status change."""
+    if old_status == new_status:
+        return
+    update_task_tiles(conn, task_id, old_status, -1)
+    update_task_tiles(conn, task_id, new_status, 1)
+
+def rebuild_task_tiles(conn):
+    """Rebuild task_tiles from the tasks table. Returns the number of tasks counted."""
+    conn.execute("DELETE FROM task_tiles")
+    tasks = conn.execute("SELECT id, status FROM tasks").fetchall()
+    for t in tasks:
+        update_task_tiles(conn, t['id'], t['status'], 1)
+    print(f"[TILES] Rebuilt map tiles for {len(tasks)} task(s)")
+    return len(tasks)
+
+
+# ============ DELTA SYNC ============
+# Every insert/update on a synced table stamps the row with the next value of one global
+# change sequence; deletes (including archival) leave a tombstone with their own sequence
+# number. A sync token is the sequence value a client last saw, so "what changed since" is an
+# indexed range scan on change_seq plus one on sync_tombstones.
+SYNCED_TABLES = ('tasks', 'community_posts', 'availability', 'impact_reports')
+TOMBSTONE_RETENTION_DAYS = 30   # Tokens older than the oldest kept tombstone must do a full reload
+
+class SyncTokenExpired(Exception):
+    pass
+
+def ensure_sync_triggers(conn, table):
+    """Create the triggers that keep change_seq/updated_at current and record deletions."""
+    bump = "UPDATE sync_sequence SET value = value + 1 WHERE id = 1;"
+    stamp = f"""UPDATE {table} SET change_seq = (SELECT value FROM sync_sequence WHERE id = 1),
+                  updated_at = datetime('now') WHERE id = NEW.id;"""
+    conn.executescript(f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_sync_insert AFTER INSERT ON {table}
+        BEGIN {bump} {stamp} END;
+
+        CREATE TRIGGER IF NOT EXISTS {table}_sync_update AFTER UPDATE ON {table}
+        WHEN NEW.change_seq IS OLD.change_seq
+        BEGIN {bump} {stamp} END;
+
+        CREATE TRIGGER IF NOT EXISTS {table}_sync_delete AFTER DELETE ON {table}
+        BEGIN {bump}
+            INSERT INTO sync_tombstones (seq, table_name, row_id)
+            VALUES ((SELECT value FROM sync_sequence WHERE id = 1), '{table}', OLD.id);
+        END;
+
+        CREATE INDEX IF NOT EXISTS idx_{table}_change_seq ON {table} (change_seq);
+    """)
+
+def backfill_change_seq(conn, table):
+    """Give rows written before the sync triggers existed a change sequence of their own."""
+    base = conn.execute("SELECT value FROM sync_sequence WHERE id = 1").fetchone()[0]
+    top = conn.execute(f"SELECT MAX(id) FROM {table} WHERE change_seq IS NULL").fetchone()[0]
+    if top is None:
+        return
+    # Explicitly setting change_seq skips the update trigger (its WHEN clause)
+    timestamp = "created_at" if table != 'availability' else "NULL"
+    conn.execute(f"""UPDATE {table} SET change_seq = ? + id,
+                     updated_at = COALESCE(updated_at, {timestamp}, datetime('now'))
+                     WHERE change_seq IS NULL""", (base,))
+    conn.execute("UPDATE sync_sequence SET value = value + ? WHERE id = 1", (top,))
+
+def sync_token(conn):
+    """The current change sequence — everything at or below it is already committed."""
+    return str(conn.execute("SELECT value FROM sync_sequence WHERE id = 1").fetchone()[0])
+
+def parse_since():
+    """?since=<token> as an int, or None for a full listing. Raises ValueError if malformed."""
+    raw = request.args.get('since')
+    if raw is None or raw == '':
+        return None
+    since = int(raw)
+    if since < 0:
+        raise ValueError(raw)
+    return since
+
+def changed_since(conn, table, since, where='1=1', params=()):
+    """Ids of live rows in table changed after since, optionally narrowed by where."""
+    horizon = conn.execute("SELECT horizon FROM sync_sequence WHERE id = 1").fetchone()[0]
+    if since < horizon:
+        raise SyncTokenExpired()
+    return [r[0] for r in conn.execute(f"SELECT id FROM {table} WHERE change_seq > ? AND ({where})",
+                                       (since, *params)).fetchall()]
+
+def sync_fields(fields, since):
+    """Delta rows are matched up by id on the client, so ?since= always returns it."""
+    if since is not None and fields is not None:
+        return fields | {'id'}
+    return fields
+
+def with_sync_token(result, token):
+    response = jsonify(result)
+    response.headers['X-Sync-Token'] = token
+    return response
+
+def delta_payload(conn, table, since, token, rows, changed_ids):
+    """?since= response body: changed rows that still match the query, and ids the client should
+    drop — deleted rows plus changed rows that no longer match (e.g. a task that was accepted)."""
+    kept = {r['id'] for r in rows}
+    deleted = [r[0] for r in conn.execute("SELECT row_id FROM sync_tombstones WHERE table_name = ? AND seq > ?",
+                                          (table, since)).fetchall()]
+    deleted += [i for i in changed_ids if i not in kept]
+    return {"token": token, "upserted": rows, "deleted": deleted}
+
+def sync_error(e):
+    if isinstance(e, SyncTokenExpired):
+        return jsonify({"error": "Sync token expired, reload without ?since="}), 410
+    return jsonify({"error": "since must be a sync token"}), 400
+
+def purge_tombstones(conn, days=TOMBSTONE_RETENTION_DAYS):
+    """Drop old tombstones and raise the horizon so older tokens get a full reload."""
+    top = conn.execute("SELECT MAX(seq) FROM sync_tombstones WHERE deleted_at < datetime('now', ?)",
+                       (f'-{int(days)} days',)).fetchone()[0]
+    if top is None:
+        return 0
+    purged = conn.execute("DELETE FROM sync_tombstones WHERE seq <= ?", (top,)).rowcount
+    conn.execute("UPDATE sync_sequence SET horizon = MAX(horizon, ?) WHERE id = 1", (top,))
+    return purged
+
+
+# ============ LOGIN LOOKUP ============
+# Identifier -> user id resolution for password login. Two unique-index seeks (email, then
+# username), cached briefly so a login storm skips them entirely. Only ids are cached — the
+# password is always checked against the row.
+LOGIN_CACHE_TTL_SECONDS = 60
+LOGIN_CACHE_SIZE = 4096
+
+_login_cache = OrderedDict()   # identifier -> (user ids, expires at)
+_login_cache_lock = threading.Lock()
+
+def login_candidates(conn, identifier):
+    """Ids of the users an identifier could name: its email match, then its username match."""
+    now = time.monotonic()
+    with _login_cache_lock:
+        cached = _login_cache.get(identifier)
+        if cached and cached[1] > now:
+            _login_cache.move_to_end(identifier)
+            return cached[0]
+
+    rows = conn.execute("""SELECT id FROM users WHERE email = ?
+                           UNION ALL SELECT id FROM users WHERE username = ?""",
+                        (identifier, identifier)).fetchall()
+    ids = tuple(dict.fromkeys(r['id'] for r in rows))
+    if ids:  # Unknown identifiers aren't cached, so a new account can sign in straight away
+        with _login_cache_lock:
+            _login_cache[identifier] = (ids, now + LOGIN_CACHE_TTL_SECONDS)
+            _login_cache.move_to_end(identifier)
+            while len(_login_cache) > LOGIN_CACHE_SIZE:
+                _login_cache.popitem(last=False)
+    return ids
+
+def invalidate_login_cache(*identifiers):
+    with _login_cache_lock:
+        for identifier in identifiers:
+            _login_cache.pop(identifier, None)
+
+def authenticate(conn, identifier, password):
+    """The public user row for a valid identifier + password, or None.
+
+    One primary-key seek per candidate; a wrong password matches no row, so nothing is read back.
+    """
+    pw_hash = hash_password(password)
+    for user_id in login_candidates(conn, identifier):
+        user = conn.execute(f"SELECT {USER_PUBLIC_COLUMNS} FROM users WHERE id = ? AND password_hash = ?",
+                            (user_id, pw_hash)).fetchone()
+        if user:
+            return user
+    return None
+
+
 # ============ AUTH ROUTES ============
 @app.route('/api/auth/login', methods=['POST'])
 def login():
@@ -296,35 +1816,38 @@ def login():
     conn = get_db()
 
     if provider:
-        # Social login — just find or create by email
+        # Social login — find or create by email
         email = data.get('email', f'{identifier}@{provider}.placeholder')
-        user = conn.execute("SELECT * FROM users WHERE email = ?", (email,)).fetchone()
+        user = conn.execute(f"SELECT {USER_PUBLIC_COLUMNS} FROM users WHERE email = ?", (email,)).fetchone()
+        conn.close()
         if user:
-            conn.close()
             return jsonify(dict(user))
-        # Auto-create social user
+        # First login: create the user, or pick up the row a concurrent first login just made
         name = data.get('name', identifier)
         initials = ''.join([w[0].upper() for w in name.split()[:2]]) if name else '??'
-        c = conn.cursor()
-        c.execute("""INSERT INTO users (name, username, email, avatar_initials, member_since)
-                     VALUES (?, ?, ?, ?, ?)""",
-                  (name, identifier.lower().replace(' ', ''), email, initials,
-                   datetime.now().strftime('%B %Y')))
-        conn.commit()
-        user = conn.execute("SELECT * FROM users WHERE id = ?", (c.lastrowid,)).fetchone()
-        conn.close()
-        return jsonify(dict(user)), 201
+        username = identifier.lower().replace(' ', '')
+
+        def write(wconn):
+            created = wconn.execute("""INSERT INTO users (name, username, email, avatar_initials, member_since)
+                                       VALUES (?, ?, ?, ?, ?) ON CONFLICT (email) DO NOTHING""",
+                                    (name, username, email, initials, datetime.now().strftime('%B %Y'))).rowcount
+            return dict(wconn.execute(f"SELECT {USER_PUBLIC_COLUMNS} FROM users WHERE email = ?",
+                                      (email,)).fetchone()), created
+
+        try:
+            user, created = run_write(write)
+        except sqlite3.IntegrityError:
+            return jsonify({"error": "Username already taken"}), 409
+        if created:
+            invalidate_login_cache(email, username)
+        return jsonify(user), 201 if created else 200
 
     # Username/password login
     if not identifier or not password:
         conn.close()
         return jsonify({"error": "Username/email and password are required"}), 400
 
-    pw_hash = hash_password(password)
-    user = conn.execute(
-        "SELECT * FROM users WHERE (email = ? OR username = ?) AND password_hash = ?",
-        (identifier, identifier, pw_hash)
-    ).fetchone()
+    user = authenticate(conn, identifier, password)
     conn.close()
 
     if user:
@@ -350,31 +1873,27 @@ def register():
     initials = ''.join([w[0].upper() for w in name.split()[:2]]) if name else username[:2].upper()
     pw_hash = hash_password(password)
 
-    conn = get_db()
-    try:
+    def write(conn):
         # Check username uniqueness
         existing = conn.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
         if existing:
-            conn.close()
-            return jsonify({"error": "Username already taken"}), 409
+            return None
+        c = conn.execute("""INSERT INTO users (name, username, email, password_hash, avatar_initials, member_since)
+                            VALUES (?, ?, ?, ?, ?, ?)""",
+                         (name, username, email, pw_hash, initials, datetime.now().strftime('%B %Y')))
+        return dict(conn.execute(f"SELECT {USER_PUBLIC_COLUMNS} FROM users WHERE id = ?", (c.lastrowid,)).fetchone())
 
-        c = conn.cursor()
-        c.execute("""INSERT INTO users (name, username, email, password_hash, avatar_initials, member_since)
-                    VALUES (?, ?, ?, ?, ?, ?)""",
-                  (name, username, email, pw_hash, initials, datetime.now().strftime('%B %Y')))
-        conn.commit()
-        user = conn.execute("SELECT * FROM users WHERE id = ?", (c.lastrowid,)).fetchone()
-        conn.close()
+    try:
+        result = run_write(write)
+        if result is None:
+            return jsonify({"error": "Username already taken"}), 409
+        invalidate_login_cache(username, email)
 
         # Send signup confirmation email
-        email_sent = send_signup_email(email, username)
-
-        result = dict(user)
-        result['email_sent'] = email_sent
+        result['email_sent'] = send_signup_email(email, username)
         return jsonify(result), 201
 
     except sqlite3.IntegrityError as e:
-        conn.close()
         if 'email' in str(e):
             return jsonify({"error": "Email already registered"}), 409
         return jsonify({"error": "Username already taken"}), 409
@@ -397,16 +1916,12 @@ def forgot_password():
     if len(new_password) < 6:
         return jsonify({"error": "Password must be at least 6 characters"}), 400
 
-    conn = get_db()
-    user = conn.execute("SELECT * FROM users WHERE email = ?", (email,)).fetchone()
-    if not user:
-        conn.close()
-        return jsonify({"error": "No account found with this email"}), 404
-
     new_hash = hash_password(new_password)
-    conn.execute("UPDATE users SET password_hash = ? WHERE email = ?", (new_hash, email))
-    conn.commit()
-    conn.close()
+    updated = run_write(lambda conn: conn.execute(
+        "UPDATE users SET password_hash = ? WHERE email = ?", (new_hash, email)).rowcount)
+    if not updated:
+        return jsonify({"error": "No account found with this email"}), 404
+    invalidate_login_cache(email)
 
     print(f"[PASSWORD-RESET] Password updated for {email}")
     return jsonify({"message": "Password updated successfully"})
@@ -421,12 +1936,26 @@ def get_tasks():
     status = request.args.get('status', '')
     skill = request.args.get('skill', '')
     user_id = request.args.get('user_id', '')
+    try:
+        since = parse_since()
+    except ValueError as e:
+        return sync_error(e)
+    fields = sync_fields(requested_fields(), since)
 
     conn = get_db()
-    query = """
-        SELECT t.*, u.name as poster_name, u.avatar_initials as poster_initials,
-               u.is_verified as poster_verified, u.is_organization as poster_is_org
-        FROM tasks t
+    token = sync_token(conn)
+    if since is not None:
+        try:
+            changed = changed_since(conn, 'tasks', since)
+        except SyncTokenExpired as e:
+            conn.close()
+            return sync_error(e)
+    columns = select_list(task_columns(
+        ('poster_name', 'u.name'), ('poster_initials', 'u.avatar_initials'),
+        ('poster_verified', 'u.is_verified'), ('poster_is_org', 'u.is_organization')), fields)
+    query = f"""
+        SELECT {columns}
+        FROM {table_source('tasks', TASK_COLUMNS, include_archived() and since is None)} t
         JOIN users u ON t.posted_by = u.id
         WHERE 1=1
     """
@@ -441,6 +1970,11 @@ def get_tasks():
     if user_id:
         query += " AND (t.posted_by = ? OR t.assigned_to = ?)"
         params.extend([user_id, user_id])
+    if request.args.get('hide_duplicates', '').lower() in ('1', 'true', 'yes'):
+        query += " AND t.duplicate_of IS NULL"
+    if since is not None:
+        query += " AND t.change_seq > ?"
+        params.append(since)
 
     query += " ORDER BY t.created_at DESC"
     tasks = conn.execute(query, params).fetchall()
@@ -456,21 +1990,30 @@ def get_tasks():
 
         if skill and skill not in t['skills']:
             continue
-        result.append(t)
+        result.append(project(t, fields))
 
+    if since is not None:
+        payload = delta_payload(conn, 'tasks', since, token, result, changed)
+        conn.close()
+        return jsonify(payload)
     conn.close()
-    return jsonify(result)
+    return with_sync_token(result, token)
 
 @app.route('/api/tasks/<int:task_id>', methods=['GET'])
 def get_task(task_id):
     """Get a single task by ID with full details."""
     conn = get_db()
-    task = conn.execute("""
-        SELECT t.*, u.name as poster_name, u.avatar_initials as poster_initials,
-               u.is_verified as poster_verified
-        FROM tasks t JOIN users u ON t.posted_by = u.id
-        WHERE t.id = ?
-    """, (task_id,)).fetchone()
+    task = None
+    # Old completed tasks may have been archived — fall back to the archive for direct lookups
+    for table in ('tasks', 'tasks_archive'):
+        task = conn.execute(f"""
+            SELECT {TASK_LIST_COLUMNS}, u.name as poster_name, u.avatar_initials as poster_initials,
+                   u.is_verified as poster_verified
+            FROM {table} t JOIN users u ON t.posted_by = u.id
+            WHERE t.id = ?
+        """, (task_id,)).fetchone()
+        if task:
+            break
     if not task:
         conn.close()
         return jsonify({"error": "Task not found"}), 404
@@ -480,16 +2023,27 @@ def get_task(task_id):
         WHERE ts.task_id = ?
     """, (t['id'],)).fetchall()
     t['skills'] = [s['name'] for s in skills]
+    t['completion_photo_url'] = blob_url(t['completion_photo_id'])
+    t['completion_photo_thumb_url'] = blob_url(t['completion_photo_id'], thumb=True)
     conn.close()
     return jsonify(t)
 
 @app.route('/api/tasks/posted/<int:user_id>', methods=['GET'])
 def get_posted_tasks(user_id):
-    """Get all tasks posted by a specific user, with a count summary."""
+    """Get all tasks posted by a specific user, with a count summary.
+
+    Archived tasks are part of a poster's history, so they're included unless
+    ?include_archived=false.
+    """
+    fields = requested_fields()
+    archived = include_archived(default=True)
     conn = get_db()
-    tasks = conn.execute("""
-        SELECT t.*, u.name as poster_name, u.avatar_initials as poster_initials
-        FROM tasks t JOIN users u ON t.posted_by = u.id
+    columns = select_list(task_columns(
+        ('poster_name', 'u.name'), ('poster_initials', 'u.avatar_initials')),
+        fields, required=('id', 'status'))
+    tasks = conn.execute(f"""
+        SELECT {columns}
+        FROM {table_source('tasks', TASK_COLUMNS, archived)} t JOIN users u ON t.posted_by = u.id
         WHERE t.posted_by = ?
         ORDER BY t.created_at DESC
     """, (user_id,)).fetchall()
@@ -503,7 +2057,7 @@ def get_posted_tasks(user_id):
             WHERE ts.task_id = ?
         """, (t['id'],)).fetchall()
         t['skills'] = [s['name'] for s in skills]
-        result.append(t)
+        result.append(project(t, fields))
         s = t.get('status', 'open')
         if s in status_counts:
             status_counts[s] += 1
@@ -541,26 +2095,10 @@ def check_task_limit(user_id):
     })
 
 @app.route('/api/tasks', methods=['POST'])
+@idempotent
 def create_task():
     data = request.json
-    conn = get_db()
-    c = conn.cursor()
-
-    # ---- Rate limit check ----
     poster_id = data.get('posted_by', 1)
-    recent_count = conn.execute("""
-        SELECT COUNT(*) as cnt FROM tasks
-        WHERE posted_by = ? AND created_at >= datetime('now', '-1 day')
-    """, (poster_id,)).fetchone()['cnt']
-
-    if recent_count >= TASK_LIMIT_PER_DAY:
-        conn.close()
-        return jsonify({
-            "error": "Daily task limit reached",
-            "message": f"You can only post {TASK_LIMIT_PER_DAY} tasks per day. Please try again tomorrow.",
-            "posts_today": recent_count,
-            "daily_limit": TASK_LIMIT_PER_DAY
-        }), 429
 
     # Simple AI: auto-suggest skills from description
     description = (data.get('description', '') + ' ' + data.get('title', '')).lower()
@@ -584,37 +2122,137 @@ def create_task():
                 auto_skills.append(skill_name)
 
     city = data.get('city', 'London')
+    signature = minhash_signature(data.get('title'), data.get('description', ''))
+
+    def write(conn):
+        # ---- Duplicate check ---- a poster re-posting their own open task gets that task back
+        duplicates = find_duplicate_tasks(conn, city, signature)
+        if not data.get('allow_duplicate'):
+            own = next((d for d in duplicates
+                        if d['posted_by'] == poster_id and d['similarity'] >= MERGE_THRESHOLD), None)
+            if own:
+                task = conn.execute(f"SELECT {TASK_LIST_COLUMNS} FROM tasks t WHERE t.id = ?",
+                                    (own['id'],)).fetchone()
+                return 0, dict(task), duplicates, True
+
+        # ---- Rate limit check ---- (on the writer, so concurrent posts can't both slip under it)
+        recent_count = conn.execute("""
+            SELECT COUNT(*) as cnt FROM tasks
+            WHERE posted_by = ? AND created_at >= datetime('now', '-1 day')
+        """, (poster_id,)).fetchone()['cnt']
+        if recent_count >= TASK_LIMIT_PER_DAY:
+            return recent_count, None, duplicates, False
+
+        start_ts, end_ts = task_interval(data.get('scheduled_date', ''), data.get('scheduled_time', ''),
+                                         data.get('duration_minutes', 60))
+        c = conn.execute("""INSERT INTO tasks (title, description, posted_by, duration_minutes,
+                    location_address, city, latitude, longitude, is_verified, scheduled_date, scheduled_time,
+                    start_ts, end_ts, duplicate_of)
+                    VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)""",
+                  (data.get('title'), data.get('description', ''), poster_id,
+                   data.get('duration_minutes', 60), data.get('location_address', ''),
+                   city, data.get('latitude', 51.5074), data.get('longitude', -0.1278),
+                   0, data.get('scheduled_date', ''), data.get('scheduled_time', ''), start_ts, end_ts,
+                   duplicates[0]['id'] if duplicates else None))
+        task_id = c.lastrowid
+        index_task(conn, task_id, city, signature)
+
+        for skill_name in auto_skills:
+            skill = conn.execute("SELECT id FROM skills WHERE name = ?", (skill_name,)).fetchone()
+            if skill:
+                conn.execute("INSERT OR IGNORE INTO task_skills VALUES (?,?)", (task_id, skill['id']))
+        update_task_tiles(conn, task_id, 'open', 1)
 
-    c.execute("""INSERT INTO tasks (title, description, posted_by, duration_minutes,
-                location_address, city, latitude, longitude, is_verified, scheduled_date, scheduled_time)
-                VALUES (?,?,?,?,?,?,?,?,?,?,?)""",
-              (data.get('title'), data.get('description', ''), data.get('posted_by', 1),
-               data.get('duration_minutes', 60), data.get('location_address', ''),
-               city, data.get('latitude', 51.5074), data.get('longitude', -0.1278),
-               0, data.get('scheduled_date', ''), data.get('scheduled_time', '')))
-    task_id = c.lastrowid
+        task = conn.execute(f"SELECT {TASK_LIST_COLUMNS} FROM tasks t WHERE t.id = ?", (task_id,)).fetchone()
+        return recent_count, dict(task), duplicates, False
 
-    for skill_name in auto_skills:
-        skill = conn.execute("SELECT id FROM skills WHERE name = ?", (skill_name,)).fetchone()
-        if skill:
-            c.execute("INSERT OR IGNORE INTO task_skills VALUES (?,?)", (task_id, skill['id']))
+    recent_count, task, duplicates, merged = run_write(write)
+    if merged:
+        return jsonify({**task, 'merged': True, 'possible_duplicates': duplicates}), 200
+    if task is None:
+        return jsonify({
+            "error": "Daily task limit reached",
+            "message": f"You can only post {TASK_LIMIT_PER_DAY} tasks per day. Please try again tomorrow.",
+            "posts_today": recent_count,
+            "daily_limit": TASK_LIMIT_PER_DAY
+        }), 429
+    return jsonify({**task, 'skills': auto_skills, 'ai_suggested_skills': auto_skills,
+                    'possible_duplicates': duplicates}), 201
 
-    conn.commit()
-    task = conn.execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
+@app.route('/api/tasks/clusters', methods=['GET'])
+def get_task_clusters():
+    """Task counts and centroids per map cell within ?bbox=west,south,east,north at ?zoom=.
+
+    Optional filters: status (comma-separated) and skill. Reads pre-aggregated task_tiles, so
+    the response grows with the viewport rather than the number of tasks.
+    """
+    try:
+        west, south, east, north = (float(v) for v in request.args.get('bbox', '').split(','))
+        zoom = int(request.args.get('zoom', 12))
+    except ValueError:
+        return jsonify({"error": "bbox=west,south,east,north and an integer zoom are required"}), 400
+    if not all(math.isfinite(v) for v in (west, south, east, north)):
+        return jsonify({"error": "bbox coordinates must be finite numbers"}), 400
+    west, east = (max(-180.0, min(180.0, v)) for v in (west, east))
+    south, north = (max(-90.0, min(90.0, v)) for v in (south, north))
+    if west > east or south > north:
+        return jsonify({"error": "bbox must be west,south,east,north"}), 400
+    statuses = [s for s in request.args.get('status', '').split(',') if s in TASK_STATUSES] or list(TASK_STATUSES)
+    skill = request.args.get('skill', '')
+
+    # Cells a little finer than the map's own tiles, coarsened until the viewport fits the cap
+    cell_zoom = max(0, min(zoom + CLUSTER_ZOOM_OFFSET, CLUSTER_MAX_ZOOM))
+    while True:
+        min_x, min_y = tile_xy(north, west, cell_zoom)  # Tile y grows southwards
+        max_x, max_y = tile_xy(south, east, cell_zoom)
+        if cell_zoom == 0 or (max_x - min_x + 1) * (max_y - min_y + 1) <= MAX_CLUSTER_CELLS:
+            break
+        cell_zoom -= 1
+
+    conn = get_db()
+    skill_id = ANY_SKILL
+    if skill:
+        row = conn.execute("SELECT id FROM skills WHERE name = ?", (skill,)).fetchone()
+        skill_id = row['id'] if row else -1
+
+    rows = conn.execute(f"""
+        SELECT tile_x, tile_y, SUM(tasks) AS tasks, SUM(lat_sum) AS lat_sum, SUM(lon_sum) AS lon_sum
+        FROM task_tiles
+        WHERE zoom = ? AND skill_id = ? AND status IN ({','.join('?' * len(statuses))})
+          AND tile_x BETWEEN ? AND ? AND tile_y BETWEEN ? AND ?
+        GROUP BY tile_x, tile_y
+        HAVING SUM(tasks) > 0
+    """, (cell_zoom, skill_id, *statuses, min_x, max_x, min_y, max_y)).fetchall()
     conn.close()
-    return jsonify({**dict(task), 'skills': auto_skills, 'ai_suggested_skills': auto_skills}), 201
+
+    clusters = [{
+        "quadkey": quadkey(r['tile_x'], r['tile_y'], cell_zoom),
+        "x": r['tile_x'],
+        "y": r['tile_y'],
+        "count": r['tasks'],
+        "latitude": round(r['lat_sum'] / r['tasks'], 6),
+        "longitude": round(r['lon_sum'] / r['tasks'], 6),
+    } for r in rows]
+    return jsonify({
+        "zoom": zoom,
+        "cell_zoom": cell_zoom,
+        "total": sum(c['count'] for c in clusters),
+        "clusters": clusters
+    })
 
 @app.route('/api/tasks/active/<int:user_id>', methods=['GET'])
 def get_active_tasks(user_id):
     """Check if a user has any incomplete accepted tasks."""
+    fields = requested_fields()
     conn = get_db()
-    active = conn.execute("""
-        SELECT t.*, u.name as poster_name
+    columns = select_list(task_columns(('poster_name', 'u.name')), fields)
+    active = conn.execute(f"""
+        SELECT {columns}
         FROM tasks t JOIN users u ON t.posted_by = u.id
         WHERE t.assigned_to = ? AND t.status = 'accepted'
         ORDER BY t.scheduled_date, t.scheduled_time
     """, (user_id,)).fetchall()
-    result = [dict(a) for a in active]
+    result = [project(dict(a), fields) for a in active]
     conn.close()
     return jsonify({
         "active_tasks": result,
@@ -626,57 +2264,88 @@ def get_active_tasks(user_id):
 def accept_task(task_id):
     data = request.json
     user_id = data.get('user_id')
-    conn = get_db()
-
-    # Block acceptance if user already has an incomplete task
-    active_count = conn.execute(
-        "SELECT COUNT(*) as cnt FROM tasks WHERE assigned_to = ? AND status = 'accepted'",
-        (user_id,)
-    ).fetchone()['cnt']
-
-    if active_count > 0:
-        conn.close()
-        return jsonify({
-            "error": "active_task_exists",
-            "message": "You must complete your current task before accepting a new one."
-        }), 409
 
-    conn.execute("UPDATE tasks SET assigned_to = ?, status = 'accepted' WHERE id = ?",
-                 (user_id, task_id))
-    conn.commit()
-    conn.close()
+    def write(conn):
+        # Block acceptance if it clashes with another task the user has scheduled
+        task = conn.execute("SELECT status, start_ts, end_ts FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        if task:
+            conflict = find_schedule_conflict(conn, user_id, task['start_ts'], task['end_ts'], task_id)
+            if conflict:
+                return {
+                    "error": "schedule_conflict",
+                    "message": f"This task overlaps with '{conflict['title']}' which you've already accepted.",
+                    "conflicting_task": dict(conflict)
+                }
+
+        # Block acceptance if user already has an incomplete task
+        active_count = conn.execute(
+            "SELECT COUNT(*) as cnt FROM tasks WHERE assigned_to = ? AND status = 'accepted'",
+            (user_id,)
+        ).fetchone()['cnt']
+        if active_count > 0:
+            return {
+                "error": "active_task_exists",
+                "message": "You must complete your current task before accepting a new one."
+            }
+        conn.execute("UPDATE tasks SET assigned_to = ?, status = 'accepted' WHERE id = ?",
+                     (user_id, task_id))
+        unindex_task(conn, task_id)
+        if task:
+            move_task_tiles(conn, task_id, task['status'], 'accepted')
+        return None
+
+    error = run_write(write)
+    if error:
+        return jsonify(error), 409
     return jsonify({"message": "Task accepted"})
 
 @app.route('/api/tasks/<int:task_id>/complete', methods=['POST'])
+@idempotent
 def complete_task(task_id):
     data = request.json
-    conn = get_db()
-
-    # Save completion photo and notes
-    completion_photo = data.get('completion_photo', '')
     completion_notes = data.get('notes', 'Task completed')
 
-    conn.execute("""UPDATE tasks SET status = 'completed', completed_at = datetime('now'),
-                    completion_photo = ?, completion_notes = ? WHERE id = ?""",
-                 (completion_photo, completion_notes, task_id))
-
-    # Auto-create impact report
-    task = conn.execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
-    if task:
-        hours = task['duration_minutes'] / 60.0
-        user_id = data.get('user_id', task['assigned_to'] or task['posted_by'])
-        conn.execute("""INSERT INTO impact_reports (user_id, task_id, hours_logged, people_helped, carbon_saved_kg, notes)
-                       VALUES (?, ?, ?, 1, ?, ?)""",
-                     (user_id, task_id, hours, round(hours * 0.4, 2), completion_notes))
-
-        # Update user stats for the volunteer who completed it
-        if user_id:
-            conn.execute("UPDATE users SET total_hours = total_hours + ?, tasks_completed = tasks_completed + 1 WHERE id = ?",
-                         (hours, user_id))
-
-    conn.commit()
-    conn.close()
-    return jsonify({"message": "Task completed", "status": "completed"})
+    # Save completion photo and notes — photos live in the blob store, the row keeps only the id.
+    # Older clients still send the photo inline as a base64 data URL.
+    photo_rows = []
+    if not data.get('completion_photo_id') and data.get('completion_photo'):
+        photo_rows = save_data_url_files(data['completion_photo'])
+
+    def write(conn):
+        completion_photo_id = data.get('completion_photo_id', '')
+        if photo_rows:
+            completion_photo_id = register_blobs(conn, photo_rows)
+        elif completion_photo_id and not blob_exists(conn, completion_photo_id):
+            return None
+
+        previous = conn.execute("SELECT status FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        conn.execute("""UPDATE tasks SET status = 'completed', completed_at = datetime('now'),
+                        completion_photo_id = ?, completion_notes = ? WHERE id = ?""",
+                     (completion_photo_id, completion_notes, task_id))
+        unindex_task(conn, task_id)
+        if previous:
+            move_task_tiles(conn, task_id, previous['status'], 'completed')
+
+        # Auto-create impact report
+        task = conn.execute("SELECT duration_minutes, assigned_to, posted_by, city FROM tasks WHERE id = ?",
+                            (task_id,)).fetchone()
+        if task:
+            hours = task['duration_minutes'] / 60.0
+            user_id = data.get('user_id', task['assigned_to'] or task['posted_by'])
+            record_impact(conn, user_id, task_id, hours, 1, round(hours * 0.4, 2), completion_notes,
+                          city=task['city'])
+
+            # Update user stats for the volunteer who completed it
+            if user_id:
+                conn.execute("UPDATE users SET total_hours = total_hours + ?, tasks_completed = tasks_completed + 1 WHERE id = ?",
+                             (hours, user_id))
+                return on_task_completed(conn, user_id, task_id)
+        return []
+
+    new_badges = run_write(write)
+    if new_badges is None:
+        return jsonify({"error": "Unknown completion_photo_id"}), 400
+    return jsonify({"message": "Task completed", "status": "completed", "new_badges": new_badges})
 
 @app.route('/api/tasks/cities', methods=['GET'])
 def get_cities():
@@ -687,6 +2356,7 @@ def get_cities():
 
 @app.route('/api/tasks/ai-match/<int:user_id>', methods=['GET'])
 def ai_match_tasks(user_id):
+    fields = requested_fields()
     conn = get_db()
     user_skills = conn.execute("""
         SELECT s.name FROM skills s
@@ -702,9 +2372,11 @@ def ai_match_tasks(user_id):
     """, (user_id,)).fetchall()
     user_city_names = {c['city'] for c in user_cities}
 
-    tasks = conn.execute("""
-        SELECT t.*, u.name as poster_name, u.avatar_initials as poster_initials,
-               u.is_verified as poster_verified
+    columns = select_list(task_columns(
+        ('poster_name', 'u.name'), ('poster_initials', 'u.avatar_initials'),
+        ('poster_verified', 'u.is_verified')), fields, required=('id', 'city'))
+    tasks = conn.execute(f"""
+        SELECT {columns}
         FROM tasks t JOIN users u ON t.posted_by = u.id
         WHERE t.status = 'open' AND t.assigned_to IS NULL
         ORDER BY t.created_at DESC
@@ -741,17 +2413,19 @@ def ai_match_tasks(user_id):
 
     scored_tasks.sort(key=lambda x: x['match_score'], reverse=True)
     conn.close()
-    return jsonify(scored_tasks)
+    return jsonify([project(t, fields) for t in scored_tasks])
 
 
 # ============ VOLUNTEERS ROUTES ============
 @app.route('/api/volunteers', methods=['GET'])
 def get_volunteers():
     skill = request.args.get('skill', '')
+    fields = requested_fields()
     conn = get_db()
 
-    query = """
-        SELECT u.*, GROUP_CONCAT(DISTINCT s.name) as skill_names
+    columns = select_list([(c, f"u.{c}") for c in USER_COLUMNS], fields)
+    query = f"""
+        SELECT {columns}, GROUP_CONCAT(DISTINCT s.name) as skill_names
         FROM users u
         LEFT JOIN user_skills us ON u.id = us.user_id
         LEFT JOIN skills s ON us.skill_id = s.id
@@ -766,14 +2440,15 @@ def get_volunteers():
         del vd['skill_names']
 
         # Get availability
-        avails = conn.execute("SELECT * FROM availability WHERE user_id = ? AND date >= date('now') ORDER BY date LIMIT 3",
+        avails = conn.execute(f"""SELECT {AVAILABILITY_CARD_COLUMNS} FROM availability
+                                  WHERE user_id = ? AND date >= date('now') ORDER BY date LIMIT 3""",
                               (vd['id'],)).fetchall()
         vd['availability'] = [dict(a) for a in avails]
         vd['distance_km'] = round(random.uniform(0.2, 5.0), 1)
 
         if skill and skill not in vd['skills']:
             continue
-        result.append(vd)
+        result.append(project(vd, fields))
 
     conn.close()
     return jsonify(result)
@@ -783,27 +2458,85 @@ def get_volunteers():
 @app.route('/api/availability', methods=['POST'])
 def post_availability():
     data = request.json
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("INSERT INTO availability (user_id, date, start_time, end_time, city) VALUES (?,?,?,?,?)",
-              (data['user_id'], data['date'], data['start_time'], data['end_time'], data.get('city', '')))
 
-    # Update user skills if provided
-    if 'skills' in data:
-        c.execute("DELETE FROM user_skills WHERE user_id = ?", (data['user_id'],))
-        for skill_name in data['skills']:
-            skill = conn.execute("SELECT id FROM skills WHERE name = ?", (skill_name,)).fetchone()
-            if skill:
-                c.execute("INSERT OR IGNORE INTO user_skills VALUES (?,?)", (data['user_id'], skill['id']))
+    start_ts, end_ts = slot_interval(data['date'], data['start_time'], data['end_time'])
 
-    conn.commit()
-    conn.close()
+    def write(conn):
+        conn.execute("""INSERT INTO availability (user_id, date, start_time, end_time, city, start_ts, end_ts)
+                        VALUES (?,?,?,?,?,?,?)""",
+                     (data['user_id'], data['date'], data['start_time'], data['end_time'], data.get('city', ''),
+                      start_ts, end_ts))
+
+        # Update user skills if provided
+        if 'skills' in data:
+            conn.execute("DELETE FROM user_skills WHERE user_id = ?", (data['user_id'],))
+            for skill_name in data['skills']:
+                skill = conn.execute("SELECT id FROM skills WHERE name = ?", (skill_name,)).fetchone()
+                if skill:
+                    conn.execute("INSERT OR IGNORE INTO user_skills VALUES (?,?)", (data['user_id'], skill['id']))
+
+    run_write(write)
     return jsonify({"message": "Availability posted"}), 201
 
+@app.route('/api/availability/free', methods=['GET'])
+def get_free_volunteers():
+    """Volunteers with an availability slot covering the whole [start, end) window.
+
+    Query params: start and end (epoch seconds or YYYY-MM-DDTHH:MM), or task_id to use a task's
+    scheduled window and city; optional city and skill. Volunteers who already have an accepted
+    task overlapping the window are left out.
+    """
+    start = parse_time_param(request.args.get('start', ''))
+    end = parse_time_param(request.args.get('end', ''))
+    city = request.args.get('city', '')
+    skill = request.args.get('skill', '')
+    task_id = request.args.get('task_id', type=int)
+
+    conn = get_db()
+    if task_id:
+        task = conn.execute("SELECT start_ts, end_ts, city FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        if not task or task['start_ts'] is None:
+            conn.close()
+            return jsonify({"error": "Task not found or not scheduled"}), 404
+        start, end = task['start_ts'], task['end_ts']
+        city = city or task['city']
+    if start is None or end is None or end <= start:
+        conn.close()
+        return jsonify({"error": "start and end (or task_id) are required, with end after start"}), 400
+
+    # A covering slot starts at or before `start`, and since slots are at most MAX_SLOT_SECONDS long
+    # it can't start before end - MAX_SLOT_SECONDS — so this is a bounded range scan on the index.
+    query = """
+        SELECT a.id as slot_id, a.date, a.start_time, a.end_time, a.city,
+               u.id, u.name, u.avatar_initials, u.is_verified, u.rating
+        FROM availability a JOIN users u ON a.user_id = u.id
+        WHERE a.start_ts BETWEEN ? AND ? AND a.end_ts >= ?
+    """
+    params = [end - MAX_SLOT_SECONDS, start, end]
+    if city:
+        query += " AND a.city = ?"
+        params.append(city)
+    if skill:
+        query += """ AND EXISTS (SELECT 1 FROM user_skills us JOIN skills s ON us.skill_id = s.id
+                                 WHERE us.user_id = u.id AND s.name = ?)"""
+        params.append(skill)
+    query += """ AND NOT EXISTS (SELECT 1 FROM tasks t WHERE t.assigned_to = u.id AND t.status = 'accepted'
+                                 AND t.start_ts < ? AND t.end_ts > ?)"""
+    params.extend([end, start])
+
+    volunteers = {}
+    for row in conn.execute(query, params).fetchall():
+        r = dict(row)
+        slot = {k: r.pop(k) for k in ('slot_id', 'date', 'start_time', 'end_time', 'city')}
+        volunteers.setdefault(r['id'], {**r, 'slots': []})['slots'].append(slot)
+    conn.close()
+    return jsonify(list(volunteers.values()))
+
 @app.route('/api/availability/<int:user_id>', methods=['GET'])
 def get_availability(user_id):
     conn = get_db()
-    avails = conn.execute("SELECT * FROM availability WHERE user_id = ? ORDER BY date", (user_id,)).fetchall()
+    source = table_source('availability', AVAILABILITY_COLUMNS, include_archived())
+    avails = conn.execute(f"SELECT * FROM {source} WHERE user_id = ? ORDER BY date", (user_id,)).fetchall()
     conn.close()
     return jsonify([dict(a) for a in avails])
 
@@ -812,67 +2545,190 @@ def get_availability(user_id):
 @app.route('/api/schedule/<int:user_id>', methods=['GET'])
 def get_schedule(user_id):
     include_completed = request.args.get('include_completed', 'false') == 'true'
+    try:
+        since = parse_since()
+    except ValueError as e:
+        return sync_error(e)
+    fields = sync_fields(requested_fields(), since)
     conn = get_db()
+    token = sync_token(conn)
 
     status_filter = "('accepted', 'open', 'completed')" if include_completed else "('accepted', 'open')"
+    params = [user_id, user_id]
+    since_filter = ''
+    if since is not None:
+        try:
+            changed = changed_since(conn, 'tasks', since, "assigned_to = ? OR posted_by = ?", params)
+        except SyncTokenExpired as e:
+            conn.close()
+            return sync_error(e)
+        since_filter = " AND t.change_seq > ?"
+        params.append(since)
 
+    columns = select_list(task_columns(('poster_name', 'u.name')), fields)
+    archived = include_completed and include_archived() and since is None
     tasks = conn.execute(f"""
-        SELECT t.*, u.name as poster_name
-        FROM tasks t JOIN users u ON t.posted_by = u.id
-        WHERE (t.assigned_to = ? OR t.posted_by = ?) AND t.status IN {status_filter}
+        SELECT {columns}
+        FROM {table_source('tasks', TASK_COLUMNS, archived)} t
+        JOIN users u ON t.posted_by = u.id
+        WHERE (t.assigned_to = ? OR t.posted_by = ?) AND t.status IN {status_filter}{since_filter}
         ORDER BY t.scheduled_date, t.scheduled_time
-    """, (user_id, user_id)).fetchall()
+    """, params).fetchall()
     result = []
     for t in tasks:
         td = dict(t)
         skills = conn.execute("SELECT s.name FROM skills s JOIN task_skills ts ON s.id = ts.skill_id WHERE ts.task_id = ?",
                               (td['id'],)).fetchall()
         td['skills'] = [s['name'] for s in skills]
-        result.append(td)
+        result.append(project(td, fields))
+    if since is not None:
+        payload = delta_payload(conn, 'tasks', since, token, result, changed)
+        conn.close()
+        return jsonify(payload)
     conn.close()
-    return jsonify(result)
+    return with_sync_token(result, token)
 
 
 # ============ COMMUNITY ROUTES ============
 @app.route('/api/community', methods=['GET'])
 def get_community_posts():
+    try:
+        since = parse_since()
+    except ValueError as e:
+        return sync_error(e)
+    fields = sync_fields(requested_fields(), since)
     conn = get_db()
-    posts = conn.execute("""
-        SELECT cp.*, u.name as author_name, u.avatar_initials, u.is_verified,
-               t.title as task_title, t.duration_minutes as task_duration, t.location_address as task_location
-        FROM community_posts cp
+    token = sync_token(conn)
+    if since is not None:
+        try:
+            changed = changed_since(conn, 'community_posts', since)
+        except SyncTokenExpired as e:
+            conn.close()
+            return sync_error(e)
+    columns = select_list([(c, f"cp.{c}") for c in POST_COLUMNS] + [
+        ('author_name', 'u.name'), ('avatar_initials', 'u.avatar_initials'), ('is_verified', 'u.is_verified'),
+        ('task_title', 'COALESCE(t.title, ta.title)'),
+        ('task_duration', 'COALESCE(t.duration_minutes, ta.duration_minutes)'),
+        ('task_location', 'COALESCE(t.location_address, ta.location_address)')], fields)
+    posts = conn.execute(f"""
+        SELECT {columns}
+        FROM {table_source('community_posts', POST_COLUMNS, include_archived() and since is None)} cp
         JOIN users u ON cp.user_id = u.id
         LEFT JOIN tasks t ON cp.task_id = t.id
+        LEFT JOIN tasks_archive ta ON cp.task_id = ta.id
+        {'WHERE cp.change_seq > ?' if since is not None else ''}
         ORDER BY cp.created_at DESC
-    """).fetchall()
+    """, () if since is None else (since,)).fetchall()
+    result = [project(dict(p), fields) for p in posts]
+    if since is not None:
+        payload = delta_payload(conn, 'community_posts', since, token, result, changed)
+        conn.close()
+        return jsonify(payload)
     conn.close()
-    return jsonify([dict(p) for p in posts])
+    return with_sync_token(result, token)
 
 @app.route('/api/community', methods=['POST'])
+@idempotent
 def create_community_post():
     data = request.json
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("INSERT INTO community_posts (user_id, task_id, content, image_url) VALUES (?,?,?,?)",
-              (data['user_id'], data.get('task_id'), data['content'], data.get('image_url', '')))
-    conn.commit()
-    conn.close()
+    image_url = data.get('image_url', '')
+    image_rows = [] if data.get('image_blob_id') else save_data_url_files(image_url)
+
+    task_id = data.get('task_id')
+
+    def write(conn):
+        # No foreign key on task_id (the task may be archived), so check both tables here
+        if task_id is not None and not conn.execute(
+                "SELECT 1 FROM tasks WHERE id = ? UNION ALL SELECT 1 FROM tasks_archive WHERE id = ?",
+                (task_id, task_id)).fetchone():
+            return "Task not found"
+        image_blob_id = data.get('image_blob_id', '')
+        if image_rows:
+            image_blob_id = register_blobs(conn, image_rows)
+        elif image_blob_id and not blob_exists(conn, image_blob_id):
+            return "Unknown image_blob_id"
+        conn.execute("INSERT INTO community_posts (user_id, task_id, content, image_url, image_blob_id) VALUES (?,?,?,?,?)",
+                     (data['user_id'], task_id, data['content'],
+                      blob_url(image_blob_id) if image_blob_id else image_url, image_blob_id))
+        return None
+
+    error = run_write(write)
+    if error:
+        return jsonify({"error": error}), 400
     return jsonify({"message": "Post created"}), 201
 
 @app.route('/api/community/<int:post_id>/like', methods=['POST'])
 def like_post(post_id):
+    run_write(lambda conn: conn.execute("UPDATE community_posts SET likes = likes + 1 WHERE id = ?", (post_id,)))
+    return jsonify({"message": "Liked"})
+
+
+# ============ BLOB ROUTES ============
+@app.route('/api/blobs', methods=['POST'])
+def upload_blob():
+    """Upload a photo (multipart field 'file'). Identical content is deduplicated by hash."""
+    upload = request.files.get('file')
+    if not upload:
+        return jsonify({"error": "No file uploaded"}), 400
+    data = upload.read()
+    if not data:
+        return jsonify({"error": "Uploaded file is empty"}), 400
+    if len(data) > BLOB_MAX_BYTES:
+        return jsonify({"error": "File too large", "max_bytes": BLOB_MAX_BYTES}), 413
+    if not (upload.mimetype or '').startswith('image/'):
+        return jsonify({"error": "Only images can be uploaded"}), 415
+    try:
+        rows = save_blob_files(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 415
+
+    def write(conn):
+        blob_id = register_blobs(conn, rows)
+        return blob_id, conn.execute("SELECT * FROM blobs WHERE id = ?", (blob_id,)).fetchone()
+
+    blob_id, blob = run_write(write)
+    return jsonify({
+        **dict(blob),
+        "url": blob_url(blob_id),
+        "thumb_url": blob_url(blob_id, thumb=True)
+    }), 201
+
+def _serve_blob(blob_id, thumb=False):
     conn = get_db()
-    conn.execute("UPDATE community_posts SET likes = likes + 1 WHERE id = ?", (post_id,))
-    conn.commit()
+    blob = conn.execute("SELECT * FROM blobs WHERE id = ?", (blob_id,)).fetchone()
+    if blob and thumb and blob['thumb_id'] and blob['thumb_id'] != blob_id:
+        blob = conn.execute("SELECT * FROM blobs WHERE id = ?", (blob['thumb_id'],)).fetchone()
     conn.close()
-    return jsonify({"message": "Liked"})
+    if not blob or not os.path.exists(blob_path(blob['id'])):
+        return jsonify({"error": "Blob not found"}), 404
+
+    # Content-addressed, so the bytes behind an id never change — cache forever.
+    # conditional=True gives us If-None-Match and Range request support.
+    # Blobs are served from the app's own origin, so only known image types render inline.
+    # Anything else (rows stored before uploads were checked) is a download.
+    is_image = blob['content_type'] in BLOB_IMAGE_TYPES
+    response = send_file(blob_path(blob['id']),
+                         mimetype=blob['content_type'] if is_image else 'application/octet-stream',
+                         as_attachment=not is_image, download_name=blob['id'],
+                         conditional=True, etag=blob['id'], max_age=31536000)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+@app.route('/api/blobs/<blob_id>', methods=['GET'])
+def get_blob(blob_id):
+    return _serve_blob(blob_id)
+
+@app.route('/api/blobs/<blob_id>/thumb', methods=['GET'])
+def get_blob_thumb(blob_id):
+    return _serve_blob(blob_id, thumb=True)
 
 
 # ============ PROFILE & IMPACT ROUTES ============
 @app.route('/api/users/<int:user_id>', methods=['GET'])
 def get_user(user_id):
     conn = get_db()
-    user = conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+    user = conn.execute(f"SELECT {USER_PUBLIC_COLUMNS} FROM users WHERE id = ?", (user_id,)).fetchone()
     if not user:
         conn.close()
         return jsonify({"error": "Not found"}), 404
@@ -893,8 +2749,9 @@ def get_user(user_id):
             SUM(CASE WHEN status = 'open' THEN 1 ELSE 0 END) as open_posted,
             SUM(CASE WHEN status = 'accepted' THEN 1 ELSE 0 END) as accepted_posted,
             SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) as completed_posted
-        FROM tasks WHERE posted_by = ?
-    """, (user_id,)).fetchone()
+        FROM (SELECT status FROM tasks WHERE posted_by = ?
+              UNION ALL SELECT status FROM tasks_archive WHERE posted_by = ?)
+    """, (user_id, user_id)).fetchone()
     ud['posted_tasks'] = dict(posted_counts)
 
     conn.close()
@@ -904,24 +2761,25 @@ def get_user(user_id):
 def get_impact(user_id):
     conn = get_db()
     reports = conn.execute("""
-        SELECT ir.*, t.title as task_title
+        SELECT ir.*, COALESCE(t.title, ta.title) as task_title
         FROM impact_reports ir
         LEFT JOIN tasks t ON ir.task_id = t.id
+        LEFT JOIN tasks_archive ta ON ir.task_id = ta.id
         WHERE ir.user_id = ?
         ORDER BY ir.created_at DESC
     """, (user_id,)).fetchall()
 
-    # Aggregate
+    # Aggregate from the monthly rollups — one row per month instead of one per report
     totals = conn.execute("""
         SELECT
-            COALESCE(SUM(hours_logged), 0) as total_hours,
+            COALESCE(SUM(hours), 0) as total_hours,
             COALESCE(SUM(items_fixed), 0) as total_items_fixed,
             COALESCE(SUM(bags_collected), 0) as total_bags,
             COALESCE(SUM(people_helped), 0) as total_people,
             COALESCE(SUM(carbon_saved_kg), 0) as total_carbon,
-            COUNT(*) as total_reports
-        FROM impact_reports WHERE user_id = ?
-    """, (user_id,)).fetchone()
+            COALESCE(SUM(reports), 0) as total_reports
+        FROM impact_rollups WHERE user_id = ? AND city = ?
+    """, (user_id, ALL_CITIES)).fetchone()
 
     conn.close()
     return jsonify({
@@ -932,30 +2790,59 @@ def get_impact(user_id):
 @app.route('/api/impact/community', methods=['GET'])
 def community_impact():
     conn = get_db()
-    totals = conn.execute("""
+    totals = dict(conn.execute("""
         SELECT
-            COALESCE(SUM(hours_logged), 0) as total_hours,
+            COALESCE(SUM(hours), 0) as total_hours,
             COALESCE(SUM(items_fixed), 0) as total_items_fixed,
             COALESCE(SUM(bags_collected), 0) as total_bags,
             COALESCE(SUM(people_helped), 0) as total_people,
-            COALESCE(SUM(carbon_saved_kg), 0) as total_carbon,
-            COUNT(DISTINCT user_id) as total_volunteers
-        FROM impact_reports
-    """).fetchone()
+            COALESCE(SUM(carbon_saved_kg), 0) as total_carbon
+        FROM impact_rollups WHERE user_id = ? AND city = ?
+    """, (ALL_USERS, ALL_CITIES)).fetchone())
+    totals['total_volunteers'] = conn.execute(
+        "SELECT COUNT(DISTINCT user_id) FROM impact_rollups WHERE user_id != ? AND city = ?",
+        (ALL_USERS, ALL_CITIES)).fetchone()[0]
 
     # Top volunteers
     top = conn.execute("""
-        SELECT u.name, u.avatar_initials, SUM(ir.hours_logged) as hours
-        FROM impact_reports ir JOIN users u ON ir.user_id = u.id
-        GROUP BY ir.user_id ORDER BY hours DESC LIMIT 5
-    """).fetchall()
+        SELECT u.name, u.avatar_initials, SUM(r.hours) as hours
+        FROM impact_rollups r JOIN users u ON r.user_id = u.id
+        WHERE r.city = ?
+        GROUP BY r.user_id ORDER BY hours DESC LIMIT 5
+    """, (ALL_CITIES,)).fetchall()
 
     conn.close()
     return jsonify({
-        "totals": dict(totals),
+        "totals": totals,
         "top_volunteers": [dict(t) for t in top]
     })
 
+@app.route('/api/impact/timeseries', methods=['GET'])
+def impact_timeseries():
+    """Monthly impact series from the rollups, for one user, one city, or everyone.
+
+    Query params (all optional): user_id, city, from=YYYY-MM, to=YYYY-MM.
+    Reads one rollup row per month via the (user_id, city, year_month) primary key.
+    """
+    user_id = request.args.get('user_id', type=int, default=ALL_USERS)
+    city = request.args.get('city', '') or ALL_CITIES
+    start = request.args.get('from', '0000-00')
+    end = request.args.get('to', '9999-99')
+
+    conn = get_db()
+    rows = conn.execute(f"""
+        SELECT year_month, {', '.join(ROLLUP_METRICS)}
+        FROM impact_rollups
+        WHERE user_id = ? AND city = ? AND year_month BETWEEN ? AND ?
+        ORDER BY year_month
+    """, (user_id, city, start, end)).fetchall()
+    conn.close()
+    return jsonify({
+        "user_id": user_id if user_id != ALL_USERS else None,
+        "city": city if city != ALL_CITIES else None,
+        "series": [dict(r) for r in rows]
+    })
+
 
 # ============ SKILLS ROUTE ============
 @app.route('/api/skills', methods=['GET'])
@@ -966,6 +2853,132 @@ def get_skills():
     return jsonify([dict(s) for s in skills])
 
 
+# ============ DEBUG ROUTES ============
+@app.route('/api/_debug/writer', methods=['GET'])
+def writer_metrics():
+    """Write queue depth and group-commit batch sizes, for tuning WRITE_BATCH_*."""
+    return jsonify(get_writer().metrics())
+
+@app.route('/api/_debug/maintenance', methods=['GET', 'POST'])
+def maintenance():
+    """GET: report from the last maintenance run. POST: run archival + VACUUM/ANALYZE now.
+
+    POST always needs DEBUG_TOKEN configured and sent as X-Debug-Token, even in local mode.
+    """
+    if request.method == 'POST':
+        if not debug_token_ok(request.headers.get('X-Debug-Token')):
+            return jsonify({"error": "Not authorised"}), 403
+        return jsonify(run_maintenance())
+    return jsonify(_last_maintenance or {"message": "Maintenance has not run yet"})
+
+PROFILE_SUMMARY_FIELDS = ('id', 'method', 'path', 'status', 'trigger', 'started_at',
+                          'duration_ms', 'sql_count', 'sql_ms', 'write_ms')
+
+def find_profile(profile_id):
+    return next((p for p in list(_profiles) if p['id'] == profile_id), None)
+
+@app.route('/api/_debug/profiles', methods=['GET'])
+def list_profiles():
+    """Recent request profiles, newest first."""
+    return jsonify([{k: p[k] for k in PROFILE_SUMMARY_FIELDS} for p in reversed(list(_profiles))])
+
+@app.route('/api/_debug/profiles/<int:profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """One profile: every SQL statement with timing and query plan, plus the hottest functions."""
+    profile = find_profile(profile_id)
+    if not profile:
+        return jsonify({"error": "Profile not found"}), 404
+    return jsonify({k: v for k, v in profile.items() if k != 'pstats'})
+
+@app.route('/api/_debug/profiles/<int:profile_id>.pstats', methods=['GET'])
+def download_profile(profile_id):
+    """Raw cProfile stats — open with `python -m pstats` or snakeviz."""
+    profile = find_profile(profile_id)
+    if not profile:
+        return jsonify({"error": "Profile not found"}), 404
+    return send_file(io.BytesIO(profile['pstats']), mimetype='application/octet-stream',
+                     as_attachment=True, download_name=f"profile-{profile_id}.pstats")
+
+
+# ============ BATCH ROUTE ============
+class SharedConnection:
+    """A connection handed to batched sub-requests. Routes close their connection when done,
+    so close() is a no-op here — the batch owns the real connection and its read transaction."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def close(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+_batch_pool = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='batch')
+
+def _run_sub_request(shared, sub):
+    """Dispatch one GET sub-request to its view function and return {id, status, body}, plus
+    {headers} when the response set any of BATCH_FORWARDED_HEADERS."""
+    if not isinstance(sub, dict):
+        return {"id": None, "status": 400, "body": {"error": "Sub-request must be an object"}}
+    result = {"id": sub.get('id')}
+    path = sub.get('path', '')
+    method = sub.get('method', 'GET').upper()
+    if method != 'GET':
+        return {**result, "status": 400, "body": {"error": "Only GET sub-requests can be batched"}}
+    url = urlsplit(path)
+    # Sub-requests skip before_request hooks, so debug routes (guarded there) can't be batched
+    if not url.path.startswith('/api/') or url.path == '/api/batch' or url.path.startswith('/api/_debug/'):
+        return {**result, "status": 400, "body": {"error": "Invalid sub-request path"}}
+
+    _shared_db.conn = shared
+    try:
+        with app.test_request_context(url.path, method='GET', query_string=url.query):
+            try:
+                endpoint, args = app.url_map.bind('').match(url.path, method='GET')
+                response = app.make_response(app.view_functions[endpoint](**args))
+            except HTTPException as e:
+                return {**result, "status": e.code, "body": {"error": e.name}}
+            result.update(status=response.status_code, body=response.get_json(silent=True))
+            headers = {h: response.headers[h] for h in BATCH_FORWARDED_HEADERS if h in response.headers}
+            if headers:
+                result['headers'] = headers
+            return result
+    except Exception as e:
+        print(f"[BATCH-ERROR] {path}: {e}")
+        return {**result, "status": 500, "body": {"error": "Internal error"}}
+    finally:
+        _shared_db.conn = None
+
+@app.route('/api/batch', methods=['POST'])
+def batch():
+    """Run several GET requests in one round-trip.
+
+    Body: {"requests": [{"id": "tasks", "path": "/api/tasks?city=London"}, ...]}
+    Sub-requests share one DB connection and one read transaction, so they all see the same
+    snapshot, and run concurrently on a small thread pool.
+    """
+    subs = (request.json or {}).get('requests', [])
+    if not isinstance(subs, list) or not subs:
+        return jsonify({"error": "requests must be a non-empty list"}), 400
+    if len(subs) > BATCH_MAX_REQUESTS:
+        return jsonify({"error": f"At most {BATCH_MAX_REQUESTS} requests per batch"}), 400
+
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    try:
+        # Open the read transaction up front and touch the DB so the snapshot is taken now
+        conn.execute("BEGIN")
+        conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+        shared = SharedConnection(conn)
+        responses = list(_batch_pool.map(lambda sub: _run_sub_request(shared, sub), subs))
+        conn.execute("ROLLBACK")
+    finally:
+        conn.close()
+    return jsonify({"responses": responses})
+
+
 # ============ SERVE REACT ============
 @app.route('/')
 def serve():
@@ -976,6 +2989,243 @@ def not_found(e):
     return send_from_directory(app.static_folder, 'index.html')
 
 
+# ============ ACHIEVEMENTS ============
+# Declarative badge rules: a badge is awarded once the user's counter for `metric` reaches `threshold`.
+# Metrics: tasks_completed, total_hours (users table), distinct_skills, longest_streak (achievement_counters).
+BADGE_RULES = [
+    {'name': 'First Step', 'icon': '⭐', 'metric': 'tasks_completed', 'threshold': 1},
+    {'name': 'Helping Hand', 'icon': '🏆', 'metric': 'tasks_completed', 'threshold': 5},
+    {'name': 'Super Volunteer', 'icon': '🌟', 'metric': 'tasks_completed', 'threshold': 20},
+    {'name': 'Community Hero', 'icon': '❤️', 'metric': 'total_hours', 'threshold': 10},
+    {'name': 'Marathon', 'icon': '🏅', 'metric': 'total_hours', 'threshold': 50},
+    {'name': 'Bullseye', 'icon': '🎯', 'metric': 'longest_streak', 'threshold': 3},
+    {'name': 'On Fire', 'icon': '🔥', 'metric': 'longest_streak', 'threshold': 8},
+    {'name': 'All-Rounder', 'icon': '🧰', 'metric': 'distinct_skills', 'threshold': 3},
+    {'name': 'Jack of All Trades', 'icon': '🎨', 'metric': 'distinct_skills', 'threshold': 6},
+]
+
+def week_start(date_str):
+    """ISO date of the Monday of the week containing date_str ('YYYY-MM-DD...')."""
+    d = datetime.strptime(date_str[:10], '%Y-%m-%d').date()
+    return (d - timedelta(days=d.weekday())).isoformat()
+
+def achievement_counters(conn, user_id):
+    row = conn.execute("""
+        SELECT u.tasks_completed, u.total_hours,
+               COALESCE(ac.distinct_skills, 0) as distinct_skills,
+               COALESCE(ac.current_streak, 0) as current_streak,
+               COALESCE(ac.longest_streak, 0) as longest_streak,
+               COALESCE(ac.last_active_week, '') as last_active_week
+        FROM users u LEFT JOIN achievement_counters ac ON ac.user_id = u.id
+        WHERE u.id = ?
+    """, (user_id,)).fetchone()
+    return dict(row) if row else None
+
+def evaluate_badges(conn, user_id, counters):
+    """Award every badge whose rule the counters satisfy. O(rules); re-awarding is a no-op
+    thanks to the unique (user_id, badge_name) index. Returns the newly awarded badges."""
+    awarded = []
+    for rule in BADGE_RULES:
+        if (counters.get(rule['metric']) or 0) >= rule['threshold']:
+            c = conn.execute("INSERT OR IGNORE INTO achievements (user_id, badge_name, badge_icon) VALUES (?, ?, ?)",
+                             (user_id, rule['name'], rule['icon']))
+            if c.rowcount:
+                awarded.append({'badge_name': rule['name'], 'badge_icon': rule['icon']})
+    return awarded
+
+def on_task_completed(conn, user_id, task_id):
+    """Update the volunteer's achievement counters for one completed task and award any new badges.
+
+    Runs inside the completion write, after users.total_hours/tasks_completed have been bumped.
+    """
+    counters = achievement_counters(conn, user_id)
+    if counters is None:
+        return []
+    conn.execute("INSERT OR IGNORE INTO achievement_counters (user_id) VALUES (?)", (user_id,))
+    new_skills = conn.execute("""INSERT OR IGNORE INTO achievement_skills_used (user_id, skill_id)
+                                 SELECT ?, skill_id FROM task_skills WHERE task_id = ?""",
+                              (user_id, task_id)).rowcount
+
+    # Same clock as impact_reports.created_at, so rebuilds agree with incremental updates
+    this_week = week_start(conn.execute("SELECT date('now')").fetchone()[0])
+    last_week = counters['last_active_week']
+    if last_week != this_week:
+        previous = (datetime.strptime(this_week, '%Y-%m-%d') - timedelta(days=7)).strftime('%Y-%m-%d')
+        counters['current_streak'] = counters['current_streak'] + 1 if last_week == previous else 1
+    counters['longest_streak'] = max(counters['longest_streak'], counters['current_streak'])
+    counters['distinct_skills'] += max(new_skills, 0)
+    counters['last_active_week'] = this_week
+
+    conn.execute("""UPDATE achievement_counters SET distinct_skills = ?, current_streak = ?,
+                    longest_streak = ?, last_active_week = ? WHERE user_id = ?""",
+                 (counters['distinct_skills'], counters['current_streak'], counters['longest_streak'],
+                  this_week, user_id))
+    return evaluate_badges(conn, user_id, counters)
+
+def rebuild_achievement_counters(conn):
+    """Recompute streak and skill-diversity counters from impact_reports and task_skills."""
+    conn.execute("DELETE FROM achievement_skills_used")
+    conn.execute("DELETE FROM achievement_counters")
+    conn.execute("""INSERT OR IGNORE INTO achievement_skills_used (user_id, skill_id)
+                    SELECT ir.user_id, ts.skill_id FROM impact_reports ir
+                    JOIN task_skills ts ON ts.task_id = ir.task_id
+                    WHERE ir.user_id IS NOT NULL""")
+
+    weeks_by_user = {}
+    for r in conn.execute("SELECT user_id, created_at FROM impact_reports WHERE user_id IS NOT NULL ORDER BY created_at"):
+        weeks_by_user.setdefault(r['user_id'], []).append(week_start(r['created_at']))
+
+    for user_id, weeks in weeks_by_user.items():
+        current = longest = 0
+        previous = None
+        for week in sorted(set(weeks)):
+            if previous and (datetime.strptime(week, '%Y-%m-%d') - datetime.strptime(previous, '%Y-%m-%d')).days == 7:
+                current += 1
+            else:
+                current = 1
+            longest = max(longest, current)
+            previous = week
+        distinct = conn.execute("SELECT COUNT(*) FROM achievement_skills_used WHERE user_id = ?",
+                                (user_id,)).fetchone()[0]
+        conn.execute("""INSERT INTO achievement_counters (user_id, distinct_skills, current_streak,
+                        longest_streak, last_active_week) VALUES (?, ?, ?, ?, ?)""",
+                     (user_id, distinct, current, longest, previous))
+    return len(weeks_by_user)
+
+def reevaluate_all_badges(conn):
+    """Bulk job for when BADGE_RULES change: rebuild counters and award badges to every user."""
+    rebuild_achievement_counters(conn)
+    awarded = 0
+    for row in conn.execute("SELECT id FROM users").fetchall():
+        counters = achievement_counters(conn, row['id'])
+        awarded += len(evaluate_badges(conn, row['id'], counters))
+    print(f"[BADGES] Re-evaluated {len(BADGE_RULES)} rule(s); awarded {awarded} new badge(s)")
+    return awarded
+
+
+# ============ MAINTENANCE COMMANDS ============
+def run_backfill_rollups():
+    conn = get_db()
+    backfill_impact_rollups(conn)
+    conn.commit()
+    conn.close()
+
+def run_reevaluate_badges():
+    conn = get_db()
+    reevaluate_all_badges(conn)
+    conn.commit()
+    conn.close()
+
+def run_rebuild_dedupe_index():
+    conn = get_db()
+    rebuild_duplicate_index(conn)
+    conn.commit()
+    conn.close()
+
+def run_rebuild_task_tiles():
+    conn = get_db()
+    rebuild_task_tiles(conn)
+    conn.commit()
+    conn.close()
+
+LOGIN_BENCH_USERS = 500
+LOGIN_BENCH_REQUESTS = 4000
+LOGIN_BENCH_CONCURRENCY = 16
+
+def run_bench_login():
+    """Login storm against a throwaway copy of the database.
+
+    Fires password logins (1 in 4 with a wrong password) and bursts of concurrent first-time
+    social logins from LOGIN_BENCH_CONCURRENCY threads, reports latency percentiles, checks no
+    social account was created twice, and times the old OR lookup against the indexed path.
+    """
+    import tempfile
+    import shutil
+    global DB_PATH
+    bench_dir = tempfile.mkdtemp(prefix='login-bench-')
+    bench_path = os.path.join(bench_dir, 'bench.db')
+    source = sqlite3.connect(DB_PATH)
+    target = sqlite3.connect(bench_path)
+    source.backup(target)
+    source.close()
+    target.execute("PRAGMA journal_mode=WAL")
+    target.executemany("""INSERT OR IGNORE INTO users (name, username, email, password_hash, member_since)
+                          VALUES (?, ?, ?, ?, 'Bench')""",
+                       [(f"Bench User {i}", f"bench{i}", f"bench{i}@example.com", hash_password(f"pw-{i}"))
+                        for i in range(LOGIN_BENCH_USERS)])
+    target.commit()
+    target.close()
+    DB_PATH = bench_path  # The writer starts lazily, so it picks this up too
+
+    def password_login(i):
+        n = random.randrange(LOGIN_BENCH_USERS)
+        identifier = f"bench{n}@example.com" if i % 2 else f"bench{n}"
+        password = f"pw-{n}" if i % 4 else "wrong-password"
+        return {'identifier': identifier, 'password': password}
+
+    def social_login(i):
+        n = i // LOGIN_BENCH_CONCURRENCY  # Each account is hit by a whole burst at once
+        return {'provider': 'gmail', 'identifier': f"social{n}", 'email': f"social{n}@example.com"}
+
+    def call(payload):
+        client = app.test_client()
+        started = time.perf_counter()
+        response = client.post('/api/auth/login', json=payload)
+        return response.status_code, (time.perf_counter() - started) * 1000
+
+    with ThreadPoolExecutor(max_workers=LOGIN_BENCH_CONCURRENCY) as pool:
+        for label, make in (('password', password_login), ('social', social_login)):
+            started = time.perf_counter()
+            results = list(pool.map(call, (make(i) for i in range(LOGIN_BENCH_REQUESTS))))
+            elapsed = time.perf_counter() - started
+            latencies = sorted(ms for _, ms in results)
+            statuses = {}
+            for status, _ in results:
+                statuses[status] = statuses.get(status, 0) + 1
+            pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+            print(f"[BENCH] {label}: {len(results)} logins in {elapsed:.2f}s ({len(results) / elapsed:.0f}/s), "
+                  f"p50 {pct(0.5):.2f}ms p95 {pct(0.95):.2f}ms p99 {pct(0.99):.2f}ms, statuses {statuses}")
+
+    conn = get_db()
+    duplicates = conn.execute("""SELECT COUNT(*) FROM (SELECT email FROM users WHERE email LIKE 'social%'
+                                 GROUP BY email HAVING COUNT(*) > 1)""").fetchone()[0]
+    print(f"[BENCH] Social accounts created more than once: {duplicates}")
+
+    lookups = [password_login(i) for i in range(LOGIN_BENCH_REQUESTS)]
+    started = time.perf_counter()
+    for q in lookups:
+        conn.execute(f"""SELECT {USER_PUBLIC_COLUMNS} FROM users
+                         WHERE (email = ? OR username = ?) AND password_hash = ?""",
+                     (q['identifier'], q['identifier'], hash_password(q['password']))).fetchone()
+    legacy_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    for q in lookups:
+        authenticate(conn, q['identifier'], q['password'])
+    indexed_ms = (time.perf_counter() - started) * 1000
+    conn.close()
+    print(f"[BENCH] Lookup only, {len(lookups)} logins: OR query {legacy_ms:.1f}ms, "
+          f"indexed + cache {indexed_ms:.1f}ms")
+    shutil.rmtree(bench_dir, ignore_errors=True)
+
+COMMANDS = {
+    'backfill-rollups': run_backfill_rollups,
+    'reevaluate-badges': run_reevaluate_badges,
+    'rebuild-dedupe-index': run_rebuild_dedupe_index,
+    'rebuild-task-tiles': run_rebuild_task_tiles,
+    'bench-login': run_bench_login,
+    'maintenance': run_maintenance,
+}
+
+
 if __name__ == '__main__':
     init_db()
-    app.run(debug=True, port=5000, host='0.0.0.0')
+    if len(sys.argv) > 1:
+        # e.g. `python app.py backfill-rollups`
+        if sys.argv[1] not in COMMANDS:
+            sys.exit(f"Unknown command '{sys.argv[1]}'. Available: {', '.join(COMMANDS)}")
+        COMMANDS[sys.argv[1]]()
+    else:
+        # With the debug reloader, only start the scheduler in the process that serves requests
+        if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            start_maintenance_scheduler()
+        app.run(debug=True, port=5000, host='0.0.0.0')
@@ -13,16 +13,25 @@ const API = process.env.REACT_APP_API_URL || '';
 
 export const AppContext = createContext();
 
+// One key per user action: resending a POST with the same key replays the first response
+// instead of repeating the write (see @idempotent in the backend).
+export function newIdempotencyKey() {
+  if (window.crypto && window.crypto.randomUUID) return window.crypto.randomUUID();
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
 export function useApi() {
   return {
     get: async (url) => {
       const res = await fetch(`${API}${url}`);
       return res.json();
     },
-    post: async (url, data) => {
+    post: async (url, data, { idempotencyKey } = {}) => {
+      const headers = { 'Content-Type': 'application/json' };
+      if (idempotencyKey) headers['Idempotency-Key'] = idempotencyKey;
       const res = await fetch(`${API}${url}`, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
+        headers,
         body: JSON.stringify(data),
       });
       const json = await res.json();
@@ -33,6 +42,36 @@ export function useApi() {
         throw err;
       }
       return json;
+    },
+    // Fetch several GET endpoints in one round-trip. Resolves to { [id]: body } and
+    // rejects if any sub-request failed, so callers can fall back to individual calls.
+    batch: async (requests) => {
+      const res = await fetch(`${API}/api/batch`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ requests }),
+      });
+      const json = await res.json();
+      if (!res.ok) throw new Error(json.error || 'Batch request failed');
+      const results = {};
+      for (const r of json.responses) {
+        if (r.status >= 400) throw new Error(`${r.id} failed with status ${r.status}`);
+        results[r.id] = r.body;
+      }
+      return results;
+    },
+    upload: async (url, file) => {
+      const body = new FormData();
+      body.append('file', file);
+      const res = await fetch(`${API}${url}`, { method: 'POST', body });
+      const json = await res.json();
+      if (!res.ok) {
+        const err = new Error(json.message || json.error || 'Upload failed');
+        err.status = res.status;
+        err.data = json;
+        throw err;
+      }
+      return json;
     }
   };
 }
@@ -1,9 +1,10 @@
-import React, { useState, useEffect, useContext } from 'react';
-import { AppContext, useApi } from '../App';
+import React, { useState, useEffect, useContext, useRef } from 'react';
+import { AppContext, useApi, newIdempotencyKey } from '../App';
 
 export default function CommunityPage() {
   const { user, showToast } = useContext(AppContext);
   const api = useApi();
+  const postKey = useRef(newIdempotencyKey());
   const [posts, setPosts] = useState([]);
   const [communityImpact, setCommunityImpact] = useState(null);
   const [newPost, setNewPost] = useState('');
@@ -11,10 +12,25 @@ export default function CommunityPage() {
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
-    loadPosts();
-    loadCommunityImpact();
+    loadAll();
   }, []);
 
+  const loadAll = async () => {
+    setLoading(true);
+    try {
+      const data = await api.batch([
+        { id: 'posts', path: '/api/community' },
+        { id: 'impact', path: '/api/impact/community' },
+      ]);
+      setPosts(data.posts);
+      setCommunityImpact(data.impact);
+      setLoading(false);
+    } catch {
+      loadPosts();
+      loadCommunityImpact();
+    }
+  };
+
   const loadPosts = async () => {
     setLoading(true);
     try {
@@ -53,7 +69,8 @@ export default function CommunityPage() {
       await api.post('/api/community', {
         user_id: user?.id || 1,
         content: newPost
-      });
+      }, { idempotencyKey: postKey.current });
+      postKey.current = newIdempotencyKey();
       showToast('Post shared! 🎉');
       setNewPost('');
       setShowPostForm(false);
@@ -1,6 +1,6 @@
 import React, { useState, useEffect, useContext, useRef } from 'react';
 import { useNavigate, useParams } from 'react-router-dom';
-import { AppContext, useApi } from '../App';
+import { AppContext, useApi, newIdempotencyKey } from '../App';
 
 export default function CompleteTaskPage() {
   const { taskId } = useParams();
@@ -8,11 +8,12 @@ export default function CompleteTaskPage() {
   const navigate = useNavigate();
   const api = useApi();
   const fileInputRef = useRef(null);
+  const idempotencyKey = useRef(newIdempotencyKey());
 
   const [task, setTask] = useState(null);
   const [notes, setNotes] = useState('');
   const [photoPreview, setPhotoPreview] = useState(null);
-  const [photoData, setPhotoData] = useState('');
+  const [photoFile, setPhotoFile] = useState(null);
   const [submitting, setSubmitting] = useState(false);
   const [completed, setCompleted] = useState(false);
   const [loading, setLoading] = useState(true);
@@ -61,29 +62,28 @@ export default function CompleteTaskPage() {
       return;
     }
 
-    // Create preview
-    const reader = new FileReader();
-    reader.onload = (event) => {
-      setPhotoPreview(event.target.result);
-      setPhotoData(event.target.result);
-    };
-    reader.readAsDataURL(file);
+    // Create preview — the file itself is uploaded to the blob store on completion
+    if (photoPreview) URL.revokeObjectURL(photoPreview);
+    setPhotoPreview(URL.createObjectURL(file));
+    setPhotoFile(file);
   };
 
   const removePhoto = () => {
+    if (photoPreview) URL.revokeObjectURL(photoPreview);
     setPhotoPreview(null);
-    setPhotoData('');
+    setPhotoFile(null);
     if (fileInputRef.current) fileInputRef.current.value = '';
   };
 
   const handleComplete = async () => {
     setSubmitting(true);
     try {
+      const photo = photoFile ? await api.upload('/api/blobs', photoFile) : null;
       await api.post(`/api/tasks/${taskId}/complete`, {
         user_id: user?.id || 1,
         notes: notes || 'Task completed successfully',
-        completion_photo: photoData
-      });
+        completion_photo_id: photo ? photo.id : ''
+      }, { idempotencyKey: idempotencyKey.current });
       setCompleted(true);
       showToast('Task completed! Great work! 🎉');
     } catch {
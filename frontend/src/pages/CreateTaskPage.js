@@ -1,6 +1,6 @@
-import React, { useState, useEffect, useContext } from 'react';
+import React, { useState, useEffect, useContext, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
-import { AppContext, useApi } from '../App';
+import { AppContext, useApi, newIdempotencyKey } from '../App';
 
 const ALL_SKILLS = ['Heavy Lifting', 'Tech Help', 'Gardening', 'Transportation', 'Cleaning', 'Cooking', 'Tutoring', 'Pet Care', 'Repairs', 'Arts & Crafts', 'Others'];
 const CITIES = ['London', 'Exeter', 'Bristol', 'Manchester', 'Liverpool'];
@@ -9,6 +9,7 @@ export default function CreateTaskPage() {
   const { user, showToast } = useContext(AppContext);
   const navigate = useNavigate();
   const api = useApi();
+  const idempotencyKey = useRef(newIdempotencyKey());
 
   const [title, setTitle] = useState('');
   const [description, setDescription] = useState('');
@@ -95,8 +96,10 @@ export default function CreateTaskPage() {
         skills: selectedSkills.length > 0 ? selectedSkills : undefined,
         scheduled_date: scheduledDate,
         scheduled_time: scheduledTime,
-      });
-      showToast('Task created successfully! 🎉');
+      }, { idempotencyKey: idempotencyKey.current });
+      showToast(result?.merged
+        ? 'You already have this task open — we kept your original post.'
+        : 'Task created successfully! 🎉');
       navigate('/');
     } catch (err) {
       if (err.status === 429) {
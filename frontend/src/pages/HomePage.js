@@ -19,18 +19,48 @@ export default function HomePage() {
   const [activeTask, setActiveTask] = useState(null);
 
   useEffect(() => {
-    loadCities();
-    checkActiveTask();
-    if (mode === 'tasks') loadTasks();
-    else if (mode === 'volunteers') loadVolunteers();
-    else if (mode === 'mytasks') loadPostedTasks();
+    loadPage();
   }, [mode, selectedCity, selectedSkill]);
 
+  // Load everything the page needs in one batched round-trip, falling back to individual calls
+  const loadPage = async () => {
+    const listPaths = {
+      tasks: user ? `/api/tasks/ai-match/${user.id}` : `/api/tasks?${taskParams()}`,
+      volunteers: `/api/volunteers${selectedSkill ? `?skill=${selectedSkill}` : ''}`,
+      mytasks: `/api/tasks/posted/${user?.id || 1}`,
+    };
+    const requests = [{ id: 'cities', path: '/api/tasks/cities' }];
+    if (user) requests.push({ id: 'active', path: `/api/tasks/active/${user.id}` });
+    if (listPaths[mode]) requests.push({ id: 'list', path: listPaths[mode] });
+
+    setLoading(true);
+    try {
+      const data = await api.batch(requests);
+      setCities(data.cities);
+      if (user) applyActiveTask(data.active);
+      if (mode === 'tasks') applyTasks(data.list);
+      else if (mode === 'volunteers') setVolunteers(data.list);
+      else if (mode === 'mytasks') setPostedData(data.list);
+      setLoading(false);
+    } catch {
+      loadCities();
+      checkActiveTask();
+      if (mode === 'tasks') loadTasks();
+      else if (mode === 'volunteers') loadVolunteers();
+      else if (mode === 'mytasks') loadPostedTasks();
+      else setLoading(false);
+    }
+  };
+
+  const applyActiveTask = (data) => {
+    setActiveTask(data.has_active ? data.active_tasks[0] : null);
+  };
+
   const checkActiveTask = async () => {
     if (!user) return;
     try {
       const data = await api.get(`/api/tasks/active/${user.id}`);
-      setActiveTask(data.has_active ? data.active_tasks[0] : null);
+      applyActiveTask(data);
     } catch {
       setActiveTask(null);
     }
@@ -61,24 +91,28 @@ export default function HomePage() {
     setLoading(false);
   };
 
+  const taskParams = () => {
+    const params = new URLSearchParams();
+    if (selectedCity) params.append('city', selectedCity);
+    if (selectedSkill) params.append('skill', selectedSkill);
+    return params;
+  };
+
+  // AI-matched results come back unfiltered, so city/skill filters are applied here
+  const applyTasks = (data) => {
+    let filtered = data;
+    if (user) {
+      if (selectedCity) filtered = filtered.filter(t => t.city === selectedCity);
+      if (selectedSkill) filtered = filtered.filter(t => t.skills?.includes(selectedSkill));
+    }
+    setTasks(filtered);
+  };
+
   const loadTasks = async () => {
     setLoading(true);
     try {
-      let url = user ? `/api/tasks/ai-match/${user.id}` : '/api/tasks';
-      const params = new URLSearchParams();
-      if (selectedCity) params.append('city', selectedCity);
-      if (selectedSkill) params.append('skill', selectedSkill);
-      
-      if (user) {
-        const data = await api.get(url);
-        let filtered = data;
-        if (selectedCity) filtered = filtered.filter(t => t.city === selectedCity);
-        if (selectedSkill) filtered = filtered.filter(t => t.skills?.includes(selectedSkill));
-        setTasks(filtered);
-      } else {
-        const data = await api.get(`/api/tasks?${params}`);
-        setTasks(data);
-      }
+      const url = user ? `/api/tasks/ai-match/${user.id}` : `/api/tasks?${taskParams()}`;
+      applyTasks(await api.get(url));
     } catch {
       setTasks(getSampleTasks());
     }
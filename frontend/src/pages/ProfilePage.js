@@ -10,10 +10,24 @@ export default function ProfilePage() {
   const [impact, setImpact] = useState(null);
 
   useEffect(() => {
-    loadProfile();
-    loadImpact();
+    loadAll();
   }, []);
 
+  const loadAll = async () => {
+    const id = user?.id || 1;
+    try {
+      const data = await api.batch([
+        { id: 'profile', path: `/api/users/${id}` },
+        { id: 'impact', path: `/api/users/${id}/impact` },
+      ]);
+      setProfile(data.profile);
+      setImpact(data.impact);
+    } catch {
+      loadProfile();
+      loadImpact();
+    }
+  };
+
   const loadProfile = async () => {
     try {
       const data = await api.get(`/api/users/${user?.id || 1}`);